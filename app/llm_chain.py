@@ -2,22 +2,58 @@
 LLM chain that ties RAG retrieval, prompt construction, and output validation together.
 """
 
+import asyncio
+import hashlib
+import json
+import time
 import structlog
+import numpy as np
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
+from app.openai_http import get_openai_http_client
+from app.rag.chunking import SENTENCE_BOUNDARY, estimate_tokens
 from app.rag.retriever import ClinicalRAGRetriever
-from app.validation.response_filter import ClinicalResponseFilter
+from app.rag.vector_store import RetrievalResult
+from app.validation.response_filter import ClinicalResponseFilter, SAFE_FALLBACK_RESPONSE
 from app.templates.prompts import (
     CLINICAL_SYSTEM_PROMPT,
+    CLINICAL_CONTEXT_PROMPT,
     QUERY_RESPONSE_PROMPT,
     INTERRUPTION_RESPONSE_PROMPT,
     SILENCE_CHECKIN_PROMPT,
+    HISTORY_SUMMARY_PROMPT,
+    INTERRUPTION_MARKER,
+    SILENCE_CHECKIN_MARKER,
 )
 from config import get_settings
 
 logger = structlog.get_logger(__name__)
 
 
+@dataclass
+class _Turn:
+    user_input: str
+    is_interruption: bool
+    is_silence: bool
+    query_vec: np.ndarray | None = None
+    hist_hash: str | None = None
+    cached_response: str | None = None
+    intent_category: str | None = None
+    results: list[RetrievalResult] = field(default_factory=list)
+    messages: list[BaseMessage] = field(default_factory=list)
+
+    @property
+    def input_type(self) -> str:
+        if self.is_silence:
+            return "silence"
+        if self.is_interruption:
+            return "interruption"
+        return "normal"
+
+
 class ClinicalLLMChain:
     def __init__(self, retriever: ClinicalRAGRetriever):
         settings = get_settings()
@@ -28,20 +64,181 @@ class ClinicalLLMChain:
             openai_api_key=settings.openai_api_key,
             temperature=0.3,
             max_tokens=1000,
+            http_async_client=get_openai_http_client(),
+        )
+        self._summary_llm = ChatOpenAI(
+            model=settings.openai_summary_model,
+            openai_api_key=settings.openai_api_key,
+            temperature=0.0,
+            max_tokens=300,
+            http_async_client=get_openai_http_client(),
         )
+        self._max_context_tokens = settings.rag_max_context_tokens
         self._conversation_history: list[dict] = []
+        self._summary_interval = settings.llm_history_summary_interval
+        self._history_keep_recent = settings.llm_history_keep_recent
+        self._history_max_tokens = settings.llm_history_max_tokens
+        self._turns_since_summary = 0
+        self._history_generation = 0
+        self._summary_task: asyncio.Task | None = None
 
-    async def generate_response(self, user_input: str) -> str:
-        is_interruption = user_input.startswith("[The patient interrupted")
-        is_silence = user_input.startswith("[SYSTEM: User has been silent")
+        self._semantic_cache_threshold = settings.llm_semantic_cache_threshold
+        self._semantic_cache_size = settings.llm_semantic_cache_size
+        self._semantic_cache_ttl = settings.llm_semantic_cache_ttl_s
+        # (expiry on the monotonic clock, unit-norm query embedding, history
+        #  window hash, filtered response, intent category and retrieval
+        #  results the response was grounded on), oldest first. Scoped to one
+        #  conversation: clear_history() empties it, so an answer generated for
+        #  one caller is never served to the next.
+        self._semantic_cache: deque[
+            tuple[float, np.ndarray, str, str, str | None, list[RetrievalResult]]
+        ] = deque(maxlen=self._semantic_cache_size)
+
+    def _history_window(self) -> list[dict]:
+        """
+        Return the history sent with each request: the running summary (if
+        any) followed by the most recent turns, trimmed to the token cap.
+        """
+        history = self._conversation_history
+        summary: list[dict] = []
+        if history and history[0]["role"] == "system":
+            summary, history = history[:1], history[1:]
+
+        budget = self._history_max_tokens - sum(
+            estimate_tokens(entry["content"]) for entry in summary
+        )
+        window: list[dict] = []
+        for entry in reversed(history[-6:]):
+            budget -= estimate_tokens(entry["content"])
+            if budget < 0:
+                break
+            window.append(entry)
+        window.reverse()
+
+        return summary + window
+
+    def _maybe_schedule_summary(self) -> None:
+        self._turns_since_summary += 1
+        if self._turns_since_summary < self._summary_interval:
+            return
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+
+        self._turns_since_summary = 0
+        self._summary_task = asyncio.create_task(self._summarize_history())
+
+    async def _summarize_history(self) -> None:
+        """
+        Compress everything but the most recent turns into one summary entry.
+
+        Runs in the background so the turn that triggered it is not delayed.
+        New turns are only ever appended, so the prefix being summarized stays
+        valid unless the history is cleared in the meantime.
+        """
+        cutoff = len(self._conversation_history) - self._history_keep_recent
+        if cutoff < 2:
+            return
+
+        generation = self._history_generation
+        transcript = "\n".join(
+            f"{entry['role']}: {entry['content']}"
+            for entry in self._conversation_history[:cutoff]
+        )
+
+        try:
+            result = await self._summary_llm.ainvoke([
+                SystemMessage(content=HISTORY_SUMMARY_PROMPT),
+                HumanMessage(content=transcript),
+            ])
+        except Exception as e:
+            logger.error("history_summary_failed", error=str(e))
+            return
+
+        if generation != self._history_generation:
+            return
+
+        self._conversation_history[:cutoff] = [{
+            "role": "system",
+            "content": f"Summary of the conversation so far: {result.content}",
+        }]
+        logger.info("history_summarized", turns_compressed=cutoff)
+
+    def _history_hash(self, window: list[dict]) -> str:
+        serialized = json.dumps(window, sort_keys=True)
+        return hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _lookup_semantic_cache(
+        self, query_vec: np.ndarray, hist_hash: str
+    ) -> tuple[str, str | None, list[RetrievalResult]] | None:
+        """Return a cached response for a near-duplicate query under the same history."""
+        # Entries share one TTL and are appended in order, so expired ones
+        # are always at the front.
+        now = time.monotonic()
+        while self._semantic_cache and self._semantic_cache[0][0] < now:
+            self._semantic_cache.popleft()
+
+        candidates = [entry for entry in self._semantic_cache if entry[2] == hist_hash]
+        if not candidates:
+            return None
+
+        # Embeddings are L2-normalized by EmbeddingManager, so the dot product
+        # is the cosine similarity.
+        cache_matrix = np.stack([entry[1] for entry in candidates])
+        sims = cache_matrix @ query_vec
+        best = int(np.argmax(sims))
+
+        if sims[best] <= self._semantic_cache_threshold:
+            return None
+
+        logger.info("semantic_cache_hit", similarity=round(float(sims[best]), 4))
+        return candidates[best][3:]
+
+    def _store_semantic_cache(
+        self,
+        query_vec: np.ndarray,
+        hist_hash: str,
+        response: str,
+        intent_category: str | None,
+        results: list[RetrievalResult],
+    ) -> None:
+        expires_at = time.monotonic() + self._semantic_cache_ttl
+        self._semantic_cache.append(
+            (expires_at, query_vec, hist_hash, response, intent_category, results)
+        )
+
+    def clear_semantic_cache(self) -> None:
+        """Drop cached responses, e.g. after the clinical content is re-indexed."""
+        self._semantic_cache.clear()
+        logger.info("semantic_cache_cleared")
+
+    async def _prepare_turn(self, user_input: str) -> _Turn:
+        """Resolve the semantic cache, retrieve context, and build the messages."""
+        turn = _Turn(
+            user_input=user_input,
+            is_interruption=user_input.startswith(INTERRUPTION_MARKER),
+            is_silence=user_input.startswith(SILENCE_CHECKIN_MARKER),
+        )
+
+        history_window = self._history_window()
 
-        context = await self._retriever.query(user_input)
+        if not (turn.is_interruption or turn.is_silence):
+            turn.query_vec = await self._retriever.embedding_manager.embed_text(user_input)
+            turn.hist_hash = self._history_hash(history_window)
+            cached = self._lookup_semantic_cache(turn.query_vec, turn.hist_hash)
+            if cached is not None:
+                turn.cached_response, turn.intent_category, turn.results = cached
+                return turn
 
-        system_message = CLINICAL_SYSTEM_PROMPT.format(clinical_context=context)
+        turn.intent_category, turn.results = await self._retriever.retrieve_with_intent(
+            user_input, turn.query_vec
+        )
+        context = self._retriever.assemble_context(
+            turn.results, max_context_tokens=self._max_context_tokens
+        )
 
-        if is_silence:
+        if turn.is_silence:
             user_prompt = SILENCE_CHECKIN_PROMPT
-        elif is_interruption:
+        elif turn.is_interruption:
             user_prompt = INTERRUPTION_RESPONSE_PROMPT.format(
                 interruption_context=user_input
             )
@@ -49,39 +246,138 @@ class ClinicalLLMChain:
             user_prompt = QUERY_RESPONSE_PROMPT.format(user_query=user_input)
 
         messages = [
-            SystemMessage(content=system_message),
+            SystemMessage(content=CLINICAL_SYSTEM_PROMPT),
         ]
 
-        for entry in self._conversation_history[-6:]:
+        for entry in history_window:
             if entry["role"] == "user":
                 messages.append(HumanMessage(content=entry["content"]))
+            elif entry["role"] == "system":
+                messages.append(SystemMessage(content=entry["content"]))
             else:
                 messages.append(AIMessage(content=entry["content"]))
 
+        messages.append(
+            SystemMessage(content=CLINICAL_CONTEXT_PROMPT.format(clinical_context=context))
+        )
         messages.append(HumanMessage(content=user_prompt))
 
-        result = await self._llm.ainvoke(messages)
-        raw_response = result.content
+        turn.messages = messages
+        return turn
 
-        if not is_silence:
-            filtered_response, validation = await self._response_filter.filter_response(
-                raw_response
+    def _record_turn(self, turn: _Turn, response: str, cacheable: bool) -> None:
+        if cacheable and turn.query_vec is not None and turn.cached_response is None:
+            self._store_semantic_cache(
+                turn.query_vec, turn.hist_hash, response,
+                turn.intent_category, turn.results,
             )
-        else:
-            filtered_response = raw_response
 
-        self._conversation_history.append({"role": "user", "content": user_input})
+        self._conversation_history.append({"role": "user", "content": turn.user_input})
         self._conversation_history.append(
-            {"role": "assistant", "content": filtered_response}
+            {"role": "assistant", "content": response}
         )
+        self._maybe_schedule_summary()
 
         logger.info(
             "response_generated",
-            input_type="silence" if is_silence else "interruption" if is_interruption else "normal",
-            response_length=len(filtered_response),
+            input_type=turn.input_type,
+            response_length=len(response),
+            cached=turn.cached_response is not None,
         )
 
-        return filtered_response
+    async def generate_response(self, user_input: str) -> str:
+        response, _, _ = await self.generate_response_with_sources(user_input)
+        return response
+
+    async def generate_response_with_sources(
+        self, user_input: str
+    ) -> tuple[str, list[RetrievalResult], str | None]:
+        """
+        Generate a response and return the retrieval results it was grounded
+        on, along with the intent category that ranked them.
+        """
+        turn = await self._prepare_turn(user_input)
+        if turn.cached_response is not None:
+            self._record_turn(turn, turn.cached_response, cacheable=False)
+            return turn.cached_response, turn.results, turn.intent_category
+
+        result = await self._llm.ainvoke(turn.messages)
+        raw_response = result.content
+
+        if not turn.is_silence:
+            filtered_response, validation = await self._response_filter.filter_response(
+                raw_response
+            )
+        else:
+            filtered_response = raw_response
+
+        self._record_turn(turn, filtered_response, cacheable=True)
+        return filtered_response, turn.results, turn.intent_category
+
+    async def stream_response(self, user_input: str) -> AsyncIterator[str]:
+        """
+        Stream the response sentence by sentence as the LLM produces it.
+
+        Full structural validation needs the whole response, so streamed
+        sentences are only sanitized and screened against the
+        disallowed-content guardrails.
+        If one fails, streaming stops and the safe fallback is emitted instead.
+        Streamed responses are not added to the semantic cache.
+        """
+        turn = await self._prepare_turn(user_input)
+        if turn.cached_response is not None:
+            self._record_turn(turn, turn.cached_response, cacheable=False)
+            yield turn.cached_response
+            return
+
+        emitted: list[str] = []
+        buffer = ""
+
+        async for chunk in self._llm.astream(turn.messages):
+            buffer += chunk.content
+            *complete, buffer = SENTENCE_BOUNDARY.split(buffer)
+            for sentence in complete:
+                sentence = self._screen_sentence(turn, sentence)
+                if sentence is None:
+                    emitted.append(SAFE_FALLBACK_RESPONSE)
+                    self._record_turn(turn, " ".join(emitted), cacheable=False)
+                    yield SAFE_FALLBACK_RESPONSE
+                    return
+                if sentence:
+                    emitted.append(sentence)
+                    yield sentence
+
+        tail = self._screen_sentence(turn, buffer)
+        if tail is None:
+            emitted.append(SAFE_FALLBACK_RESPONSE)
+            yield SAFE_FALLBACK_RESPONSE
+        elif tail:
+            emitted.append(tail)
+            yield tail
+
+        self._record_turn(turn, " ".join(emitted), cacheable=False)
+
+    def _screen_sentence(self, turn: _Turn, sentence: str) -> str | None:
+        """
+        Sanitize a streamed sentence. Returns None if it fails the guardrails,
+        or an empty string if nothing remains once artifacts are removed.
+        """
+        sentence = self._response_filter.sanitize_partial(sentence)
+        if turn.is_silence or not sentence:
+            return sentence
+        issues = self._response_filter.screen_partial(sentence)
+        if issues:
+            logger.warning(
+                "streamed_sentence_rejected",
+                issues=[i.code for i in issues],
+            )
+            return None
+        return sentence
 
     def clear_history(self) -> None:
         self._conversation_history.clear()
+        self._turns_since_summary = 0
+        self._history_generation += 1
+        # A new conversation may be a different patient; cached answers can
+        # echo details from the previous caller's query.
+        self._semantic_cache.clear()
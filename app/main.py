@@ -7,14 +7,17 @@ Exposes endpoints for:
   - System health monitoring
 """
 
+import orjson
 import structlog
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from app.rag.retriever import ClinicalRAGRetriever
-from app.voice.vapi_client import VapiVoiceClient
+from app.voice.vapi_client import VapiVoiceClient, close_vapi_http_clients
 from app.llm_chain import ClinicalLLMChain
+from app.openai_http import close_openai_http_client
 from config import get_settings
 
 structlog.configure(
@@ -47,6 +50,10 @@ async def lifespan(app: FastAPI):
     chunk_count = await retriever.load_clinical_content()
     logger.info("clinical_content_indexed", chunks=chunk_count)
 
+    # Embed the intent keywords now so the first query neither pays for them
+    # nor falls back to keyword classification.
+    await retriever.build_intent_centroids()
+
     llm_chain = ClinicalLLMChain(retriever)
 
     vapi_client = VapiVoiceClient()
@@ -57,6 +64,8 @@ async def lifespan(app: FastAPI):
 
     if vapi_client:
         await vapi_client.close()
+    await close_vapi_http_clients()
+    await close_openai_http_client()
     logger.info("application_shutdown")
 
 
@@ -128,9 +137,9 @@ async def query_clinical_content(request: QueryRequest):
     if not retriever or not llm_chain:
         raise HTTPException(status_code=503, detail="RAG system not initialized")
 
-    results = await retriever.retrieve(request.query)
-    response = await llm_chain.generate_response(request.query)
-    category, _ = retriever.classify_intent(request.query)
+    response, results, category = await llm_chain.generate_response_with_sources(
+        request.query
+    )
 
     sources = [
         {
@@ -148,20 +157,30 @@ async def query_clinical_content(request: QueryRequest):
     )
 
 
+@app.post("/api/query/stream")
+async def stream_clinical_response(request: QueryRequest):
+    """Stream the response one sentence per line as it is generated."""
+    if not llm_chain:
+        raise HTTPException(status_code=503, detail="RAG system not initialized")
+
+    sentences = (
+        f"{sentence}\n" async for sentence in llm_chain.stream_response(request.query)
+    )
+    return StreamingResponse(sentences, media_type="text/plain")
+
+
 @app.post("/api/vapi/webhook")
 async def vapi_webhook(request: Request):
     """Handle Vapi.ai webhook events."""
     if not vapi_client:
         raise HTTPException(status_code=503, detail="Voice client not initialized")
 
-    body = await request.json()
+    body = orjson.loads(await request.body())
     logger.info("webhook_received", event_type=body.get("message", {}).get("type"))
 
     result = await vapi_client.handle_webhook_event(body)
 
-    if result:
-        return result
-    return {"status": "ok"}
+    return ORJSONResponse(result or {"status": "ok"})
 
 
 @app.post("/api/calls")
@@ -196,6 +215,9 @@ async def reload_clinical_content():
 
     await retriever.vector_store.clear()
     count = await retriever.load_clinical_content()
+    # Cached responses were grounded on the old content.
+    if llm_chain:
+        llm_chain.clear_semantic_cache()
 
     return {"status": "reindexed", "chunks_indexed": count}
 
@@ -0,0 +1,33 @@
+"""
+Shared HTTP client for OpenAI API calls.
+
+Every ChatOpenAI and OpenAIEmbeddings instance in the app is handed the same
+pooled client, so concurrent embedding batches and chat calls reuse warm
+connections instead of each paying a TCP+TLS handshake. HTTP/2 multiplexing
+is enabled when the optional `h2` package is installed.
+"""
+
+import importlib.util
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_openai_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=30.0,
+        )
+    return _client
+
+
+async def close_openai_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
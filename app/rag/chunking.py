@@ -11,6 +11,8 @@ FIX APPLIED: Irrelevant chunk retrieval bug
 """
 
 import re
+from bisect import bisect_left
+from itertools import accumulate
 import structlog
 from dataclasses import dataclass, field
 from config import get_settings
@@ -25,6 +27,8 @@ SECTION_MARKERS = re.compile(
     re.MULTILINE | re.IGNORECASE,
 )
 
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
 
 @dataclass
 class ClinicalChunk:
@@ -51,9 +55,13 @@ def split_clinical_content(
     Split clinical content into semantically coherent chunks that respect
     section boundaries like [IF YES], [CLOSING], etc.
     """
-    settings = get_settings()
-    max_tokens = max_chunk_tokens or settings.rag_chunk_size
-    overlap_tokens = chunk_overlap_tokens or settings.rag_chunk_overlap
+    max_tokens = max_chunk_tokens
+    overlap_tokens = chunk_overlap_tokens
+    # Callers chunking many templates pass both sizes to skip the lookup.
+    if not (max_tokens and overlap_tokens):
+        settings = get_settings()
+        max_tokens = max_tokens or settings.rag_chunk_size
+        overlap_tokens = overlap_tokens or settings.rag_chunk_overlap
 
     sections = _split_into_sections(text)
     chunks: list[ClinicalChunk] = []
@@ -127,32 +135,20 @@ def _split_large_section(
     text: str, max_tokens: int, overlap_tokens: int
 ) -> list[str]:
     """Split an oversized section at sentence boundaries with overlap."""
-    sentences = re.split(r"(?<=[.!?])\s+", text)
+    sentences = SENTENCE_BOUNDARY.split(text)
+    # prefix[k] is the token count of sentences[:k]; inlined estimate_tokens.
+    prefix = [0, *accumulate(len(sentence) // 4 or 1 for sentence in sentences)]
     chunks = []
-    current: list[str] = []
-    current_tokens = 0
-
-    for sentence in sentences:
-        sent_tokens = estimate_tokens(sentence)
-
-        if current_tokens + sent_tokens > max_tokens and current:
-            chunks.append(" ".join(current))
-            overlap_text = " ".join(current)
-            overlap_sents: list[str] = []
-            overlap_count = 0
-            for s in reversed(current):
-                t = estimate_tokens(s)
-                if overlap_count + t > overlap_tokens:
-                    break
-                overlap_sents.insert(0, s)
-                overlap_count += t
-            current = overlap_sents
-            current_tokens = overlap_count
-
-        current.append(sentence)
-        current_tokens += sent_tokens
-
-    if current:
-        chunks.append(" ".join(current))
+    start = 0
+
+    for i in range(len(sentences)):
+        if prefix[i + 1] - prefix[start] > max_tokens and i > start:
+            chunks.append(" ".join(sentences[start:i]))
+            # Carry over the longest run of trailing sentences that fits in
+            # the overlap budget.
+            start = bisect_left(prefix, prefix[i] - overlap_tokens, start, i)
+
+    if start < len(sentences):
+        chunks.append(" ".join(sentences[start:]))
 
     return chunks
@@ -8,11 +8,17 @@ FIX APPLIED: Embedding mismatch bug
   and normalized all embeddings to unit vectors before storage and comparison.
 """
 
+import asyncio
 import hashlib
+import sqlite3
+import threading
 import structlog
 import numpy as np
+from collections import OrderedDict
+from pathlib import Path
 from typing import Optional
 from langchain_openai import OpenAIEmbeddings
+from app.openai_http import get_openai_http_client
 from config import get_settings
 
 logger = structlog.get_logger(__name__)
@@ -27,9 +33,15 @@ class EmbeddingManager:
         self._embeddings = OpenAIEmbeddings(
             model=self._model_name,
             openai_api_key=settings.openai_api_key,
+            http_async_client=get_openai_http_client(),
         )
+        self._batch_size = settings.openai_embedding_batch_size
+        self._max_concurrency = settings.openai_embedding_max_concurrency
         self._expected_dimensions: Optional[int] = None
-        self._embedding_cache: dict[str, list[float]] = {}
+        self._cache_size = settings.openai_embedding_cache_size
+        self._embedding_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._disk_lock = threading.Lock()
+        self._disk_cache = self._open_disk_cache(settings.embedding_cache_path)
 
         logger.info(
             "embedding_manager_initialized",
@@ -45,16 +57,91 @@ class EmbeddingManager:
         return self._embeddings
 
     def _cache_key(self, text: str) -> str:
-        return hashlib.sha256(text.encode("utf-8")).hexdigest()
-
-    def _normalize(self, vector: list[float]) -> list[float]:
-        """L2-normalize embedding vectors to ensure cosine similarity correctness."""
-        arr = np.array(vector, dtype=np.float64)
-        norm = np.linalg.norm(arr)
-        if norm == 0:
-            logger.warning("zero_norm_embedding_detected")
-            return vector
-        return (arr / norm).tolist()
+        # Non-cryptographic use: blake2b with a 16-byte digest is faster than
+        # sha256 and collision-safe at this cache size.
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cache_get(self, cache_key: str) -> np.ndarray | None:
+        vector = self._embedding_cache.get(cache_key)
+        if vector is not None:
+            self._embedding_cache.move_to_end(cache_key)
+        return vector
+
+    def _cache_put(self, cache_key: str, vector: np.ndarray) -> None:
+        """Insert into the LRU cache, evicting the least recently used entries."""
+        self._embedding_cache[cache_key] = vector
+        self._embedding_cache.move_to_end(cache_key)
+        while len(self._embedding_cache) > self._cache_size:
+            self._embedding_cache.popitem(last=False)
+
+    def _open_disk_cache(self, path: str) -> sqlite3.Connection | None:
+        """
+        Open the persistent embedding cache so restarts don't re-embed
+        unchanged content. Rows are keyed by (model, text hash), so switching
+        models never serves stale vectors. An empty path disables it.
+
+        Only indexed documents are persisted; patient queries from
+        embed_text stay in memory so no PHI is written to disk.
+        """
+        if not path:
+            return None
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL with NORMAL sync skips the fsync on every commit; a crash can
+        # lose only the last few cache rows, which are simply re-embedded.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, key))"
+        )
+        conn.commit()
+        return conn
+
+    def _disk_get_many(self, cache_keys: list[str]) -> dict[str, np.ndarray]:
+        if self._disk_cache is None or not cache_keys:
+            return {}
+
+        found: dict[str, np.ndarray] = {}
+        with self._disk_lock:
+            # Stay well under SQLite's bound-parameter limit.
+            for i in range(0, len(cache_keys), 500):
+                batch = cache_keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._disk_cache.execute(
+                    f"SELECT key, vector FROM embeddings "
+                    f"WHERE model = ? AND key IN ({placeholders})",
+                    (self._model_name, *batch),
+                )
+                for cache_key, blob in rows:
+                    found[cache_key] = np.frombuffer(blob, dtype=np.float32).copy()
+        return found
+
+    def _disk_put_many(self, items: list[tuple[str, np.ndarray]]) -> None:
+        if self._disk_cache is None or not items:
+            return
+
+        with self._disk_lock:
+            self._disk_cache.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                [(self._model_name, key, vector.tobytes()) for key, vector in items],
+            )
+            self._disk_cache.commit()
+
+    def normalize_batch(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        L2-normalize a (n, d) float32 matrix of embeddings in place to ensure
+        cosine similarity correctness.
+        """
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        zero_rows = norms[:, 0] == 0
+        if zero_rows.any():
+            logger.warning("zero_norm_embedding_detected", count=int(zero_rows.sum()))
+            norms[zero_rows] = 1.0
+        matrix /= norms
+        return matrix
 
     def _validate_dimensions(self, vector: list[float]) -> None:
         if self._expected_dimensions is None:
@@ -67,50 +154,95 @@ class EmbeddingManager:
                 f"indexing and querying. Re-index all documents with the current model."
             )
 
-    async def embed_text(self, text: str) -> list[float]:
+    async def embed_text(self, text: str) -> np.ndarray:
         cache_key = self._cache_key(text)
-        if cache_key in self._embedding_cache:
-            return self._embedding_cache[cache_key]
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
 
         raw = await self._embeddings.aembed_query(text)
         self._validate_dimensions(raw)
-        normalized = self._normalize(raw)
-        self._embedding_cache[cache_key] = normalized
+        normalized = self.normalize_batch(np.asarray([raw], dtype=np.float32))[0]
+        self._cache_put(cache_key, normalized)
 
         logger.debug("text_embedded", text_length=len(text), dimensions=len(normalized))
         return normalized
 
-    async def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        results = []
-        uncached_texts = []
-        uncached_indices = []
+    async def embed_documents(self, texts: list[str]) -> np.ndarray:
+        """Embed texts, returning a (len(texts), d) float32 matrix of unit vectors."""
+        results: list[np.ndarray | None] = []
+        missing: dict[str, list[int]] = {}
+        missing_texts: dict[str, str] = {}
 
         for i, text in enumerate(texts):
             cache_key = self._cache_key(text)
-            if cache_key in self._embedding_cache:
-                results.append(self._embedding_cache[cache_key])
-            else:
-                results.append([])
-                uncached_texts.append(text)
-                uncached_indices.append(i)
-
-        if uncached_texts:
-            raw_embeddings = await self._embeddings.aembed_documents(uncached_texts)
-            for idx, raw in zip(uncached_indices, raw_embeddings):
+            cached = self._cache_get(cache_key)
+            results.append(cached)
+            if cached is None:
+                missing.setdefault(cache_key, []).append(i)
+                missing_texts[cache_key] = text
+
+        stored = await asyncio.to_thread(self._disk_get_many, list(missing))
+        for cache_key, vector in stored.items():
+            self._validate_dimensions(vector)
+            self._cache_put(cache_key, vector)
+            for idx in missing.pop(cache_key):
+                results[idx] = vector
+
+        if missing:
+            uncached_keys = list(missing)
+            raw_embeddings = await self._embed_in_batches(
+                [missing_texts[key] for key in uncached_keys]
+            )
+            for raw in raw_embeddings:
                 self._validate_dimensions(raw)
-                normalized = self._normalize(raw)
-                cache_key = self._cache_key(texts[idx])
-                self._embedding_cache[cache_key] = normalized
-                results[idx] = normalized
+            normalized = self.normalize_batch(
+                np.asarray(raw_embeddings, dtype=np.float32)
+            )
+            for cache_key, row in zip(uncached_keys, normalized):
+                self._cache_put(cache_key, row)
+                for idx in missing[cache_key]:
+                    results[idx] = row
+            await asyncio.to_thread(
+                self._disk_put_many, list(zip(uncached_keys, normalized))
+            )
 
+        computed = sum(len(indices) for indices in missing.values())
         logger.info(
             "documents_embedded",
             total=len(texts),
-            cached=len(texts) - len(uncached_texts),
-            computed=len(uncached_texts),
+            cached=len(texts) - computed,
+            from_disk=len(stored),
+            computed=computed,
         )
-        return results
+        if not results:
+            return np.empty((0, self._expected_dimensions or 0), dtype=np.float32)
+        return np.stack(results)
+
+    async def _embed_in_batches(self, texts: list[str]) -> list[list[float]]:
+        """
+        Split texts into provider-sized batches and embed them concurrently,
+        bounded by a semaphore to stay under rate limits.
+        """
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        batches = [
+            texts[i : i + self._batch_size]
+            for i in range(0, len(texts), self._batch_size)
+        ]
+
+        async def embed_batch(batch: list[str]) -> list[list[float]]:
+            async with semaphore:
+                return await self._embeddings.aembed_documents(batch)
+
+        raw_batches = await asyncio.gather(*(embed_batch(b) for b in batches))
+        return [vector for batch in raw_batches for vector in batch]
 
     def clear_cache(self) -> None:
         self._embedding_cache.clear()
+        if self._disk_cache is not None:
+            with self._disk_lock:
+                self._disk_cache.execute(
+                    "DELETE FROM embeddings WHERE model = ?", (self._model_name,)
+                )
+                self._disk_cache.commit()
         logger.info("embedding_cache_cleared")
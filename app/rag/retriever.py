@@ -11,8 +11,12 @@ FIX APPLIED: Context window optimization
   intent classification to route queries to the correct content category.
 """
 
+import asyncio
+import re
 import yaml
+import numpy as np
 import structlog
+from collections import Counter
 from pathlib import Path
 from app.rag.embeddings import EmbeddingManager
 from app.rag.vector_store import ClinicalVectorStore, RetrievalResult
@@ -44,6 +48,33 @@ INTENT_KEYWORDS: dict[str, list[str]] = {
     ],
 }
 
+_KEYWORD_TO_CATEGORY: dict[str, str] = {
+    kw.lower(): category
+    for category, keywords in INTENT_KEYWORDS.items()
+    for kw in keywords
+}
+
+# One lookahead per keyword, so a single finditer pass reports a keyword at
+# every position it starts, including inside another match ("schedule" in
+# "reschedule"). Longest first: where several keywords start at the same
+# position only the first is reported, so shorter keywords contained in a
+# match are added back through _KEYWORD_CONTAINS.
+_INTENT_KEYWORD_RE = re.compile(
+    "|".join(
+        f"(?=({re.escape(kw)}))"
+        for kw in sorted(_KEYWORD_TO_CATEGORY, key=len, reverse=True)
+    )
+)
+_KEYWORD_CONTAINS: dict[str, frozenset[str]] = {
+    kw: frozenset(other for other in _KEYWORD_TO_CATEGORY if other in kw)
+    for kw in _KEYWORD_TO_CATEGORY
+}
+
+
+def _load_yaml(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
 
 class ClinicalRAGRetriever:
     def __init__(self):
@@ -51,10 +82,18 @@ class ClinicalRAGRetriever:
         self._vector_store = ClinicalVectorStore(self._embedding_manager)
         self._templates_loaded = False
 
+        self._intent_categories: list[str] = list(INTENT_KEYWORDS)
+        self._category_centroids: np.ndarray | None = None
+        self._intent_similarity_threshold = get_settings().rag_intent_similarity_threshold
+
     @property
     def vector_store(self) -> ClinicalVectorStore:
         return self._vector_store
 
+    @property
+    def embedding_manager(self) -> EmbeddingManager:
+        return self._embedding_manager
+
     async def load_clinical_content(
         self, data_path: str = "clinical_data/clinical_scripts.yaml"
     ) -> int:
@@ -62,30 +101,43 @@ class ClinicalRAGRetriever:
         if not path.exists():
             raise FileNotFoundError(f"Clinical data file not found: {data_path}")
 
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+        data = await asyncio.to_thread(_load_yaml, path)
+        settings = get_settings()
+        chunk_sizes = {
+            "max_chunk_tokens": settings.rag_chunk_size,
+            "chunk_overlap_tokens": settings.rag_chunk_overlap,
+        }
 
-        all_chunks = []
+        chunk_inputs = [
+            {
+                "text": template["script"],
+                "source_id": template["id"],
+                "source_category": template["category"],
+                "source_title": template["title"],
+                "tags": template.get("tags", []),
+                **chunk_sizes,
+            }
+            for template in data.get("templates", [])
+        ] + [
+            {
+                "text": knowledge["content"],
+                "source_id": knowledge["id"],
+                "source_category": knowledge["category"],
+                "source_title": knowledge["id"].replace("_", " ").title(),
+                "tags": knowledge.get("tags", []),
+                **chunk_sizes,
+            }
+            for knowledge in data.get("clinical_knowledge", [])
+        ]
 
-        for template in data.get("templates", []):
-            chunks = split_clinical_content(
-                text=template["script"],
-                source_id=template["id"],
-                source_category=template["category"],
-                source_title=template["title"],
-                tags=template.get("tags", []),
-            )
-            all_chunks.extend(chunks)
-
-        for knowledge in data.get("clinical_knowledge", []):
-            chunks = split_clinical_content(
-                text=knowledge["content"],
-                source_id=knowledge["id"],
-                source_category=knowledge["category"],
-                source_title=knowledge["id"].replace("_", " ").title(),
-                tags=knowledge.get("tags", []),
-            )
-            all_chunks.extend(chunks)
+        # Chunking, like the YAML load above, is synchronous; run it off the
+        # event loop so health checks and webhooks stay responsive while
+        # content loads.
+        chunk_lists = await asyncio.gather(*(
+            asyncio.to_thread(split_clinical_content, **kwargs)
+            for kwargs in chunk_inputs
+        ))
+        all_chunks = [chunk for chunks in chunk_lists for chunk in chunks]
 
         indexed = await self._vector_store.index_chunks(all_chunks)
         self._templates_loaded = True
@@ -95,13 +147,17 @@ class ClinicalRAGRetriever:
 
     def classify_intent(self, query: str) -> tuple[str | None, list[str]]:
         """Classify query intent to enable targeted retrieval."""
-        query_lower = query.lower()
-        scores: dict[str, int] = {}
+        matched: set[str] = set()
+        for m in _INTENT_KEYWORD_RE.finditer(query.lower()):
+            matched |= _KEYWORD_CONTAINS[m.group(m.lastindex)]
+        counts = Counter(_KEYWORD_TO_CATEGORY[kw] for kw in matched)
 
-        for category, keywords in INTENT_KEYWORDS.items():
-            score = sum(1 for kw in keywords if kw in query_lower)
-            if score > 0:
-                scores[category] = score
+        # Preserve INTENT_KEYWORDS order so ties resolve as before.
+        scores: dict[str, int] = {
+            category: counts[category]
+            for category in INTENT_KEYWORDS
+            if counts[category] > 0
+        }
 
         if not scores:
             return None, []
@@ -117,15 +173,90 @@ class ClinicalRAGRetriever:
         )
         return best_category, relevant_tags
 
-    async def retrieve(self, query: str) -> list[RetrievalResult]:
-        category, tags = self.classify_intent(query)
-        return await self._vector_store.retrieve(
+    async def build_intent_centroids(self) -> None:
+        """
+        Embed INTENT_KEYWORDS and store one unit-norm centroid per category,
+        so queries that already carry an embedding can be classified with a
+        single matrix-vector product.
+        """
+        keywords = [
+            kw for category in self._intent_categories for kw in INTENT_KEYWORDS[category]
+        ]
+        vectors = await self._embedding_manager.embed_documents(keywords)
+
+        centroids = []
+        offset = 0
+        for category in self._intent_categories:
+            count = len(INTENT_KEYWORDS[category])
+            centroids.append(vectors[offset : offset + count].mean(axis=0))
+            offset += count
+
+        matrix = np.stack(centroids).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._category_centroids = matrix
+
+        logger.info("intent_centroids_built", categories=len(self._intent_categories))
+
+    def classify_intent_by_embedding(
+        self, query_embedding: np.ndarray
+    ) -> tuple[str | None, list[str]]:
+        """Classify intent by cosine similarity to the category centroids."""
+        if self._category_centroids is None:
+            return None, []
+
+        scores = self._category_centroids @ query_embedding
+        best = int(np.argmax(scores))
+
+        if scores[best] < self._intent_similarity_threshold:
+            return None, []
+
+        best_category = self._intent_categories[best]
+        logger.debug(
+            "intent_classified",
+            category=best_category,
+            score=round(float(scores[best]), 4),
+        )
+        return best_category, INTENT_KEYWORDS[best_category]
+
+    async def _classify_by_embedding(
+        self, query_embedding: np.ndarray
+    ) -> tuple[str | None, list[str]]:
+        if self._category_centroids is None:
+            await self.build_intent_centroids()
+        return self.classify_intent_by_embedding(query_embedding)
+
+    async def retrieve(
+        self, query: str, query_embedding: np.ndarray | None = None
+    ) -> list[RetrievalResult]:
+        _, results = await self.retrieve_with_intent(query, query_embedding)
+        return results
+
+    async def retrieve_with_intent(
+        self, query: str, query_embedding: np.ndarray | None = None
+    ) -> tuple[str | None, list[RetrievalResult]]:
+        """Retrieve and rank chunks, also returning the intent category used."""
+        if query_embedding is None:
+            # Keyword scoring is a single regex pass; run it inline rather
+            # than paying for a thread hop.
+            category, tags = self.classify_intent(query)
+            raw_results = await self._vector_store.search(query)
+        else:
+            # Building the centroids may await the embedding API on first
+            # use, so overlap it with the dense search.
+            (category, tags), raw_results = await asyncio.gather(
+                self._classify_by_embedding(query_embedding),
+                self._vector_store.search(query, query_embedding=query_embedding),
+            )
+        return category, self._vector_store.rank(
+            raw_results,
             query=query,
             category_hint=category,
             tag_hints=tags,
         )
 
-    def assemble_context(self, results: list[RetrievalResult]) -> str:
+    def assemble_context(
+        self, results: list[RetrievalResult], max_context_tokens: int | None = None
+    ) -> str:
         """
         Assemble retrieved chunks into a structured context block
         with clear delineation and source attribution.
@@ -133,9 +264,10 @@ class ClinicalRAGRetriever:
         if not results:
             return "No relevant clinical content found for this query."
 
-        settings = get_settings()
+        budget = max_context_tokens or get_settings().rag_max_context_tokens
         sections: list[str] = []
         total_tokens = 0
+        last_included = 0
 
         sections.append(
             "=== RETRIEVED CLINICAL CONTEXT ===\n"
@@ -144,7 +276,7 @@ class ClinicalRAGRetriever:
         )
 
         for i, result in enumerate(results, 1):
-            if total_tokens + result.token_estimate > settings.rag_max_context_tokens:
+            if total_tokens + result.token_estimate > budget:
                 sections.append(
                     f"\n[Context truncated: {len(results) - i + 1} additional "
                     f"chunks omitted to fit context window]"
@@ -153,24 +285,26 @@ class ClinicalRAGRetriever:
 
             source = result.metadata.get("title", "Unknown")
             section = result.metadata.get("section", "general")
-            score = round(result.score, 3)
 
             sections.append(
                 f"\n--- Source {i}: {source} (section: {section}, "
-                f"relevance: {score}) ---\n{result.text}"
+                f"relevance: {result.score:.3f}) ---\n{result.text}"
             )
             total_tokens += result.token_estimate
+            last_included = i
 
         sections.append("\n=== END CLINICAL CONTEXT ===")
 
         context = "\n".join(sections)
         logger.info(
             "context_assembled",
-            chunks_included=min(len(results), i if 'i' in dir() else len(results)),
+            chunks_included=last_included,
             total_tokens=total_tokens,
         )
         return context
 
-    async def query(self, user_query: str) -> str:
-        results = await self.retrieve(user_query)
+    async def query(
+        self, user_query: str, query_embedding: np.ndarray | None = None
+    ) -> str:
+        results = await self.retrieve(user_query, query_embedding)
         return self.assemble_context(results)
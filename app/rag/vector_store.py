@@ -6,13 +6,20 @@ FIX APPLIED: Irrelevant content retrieval
   score, meaning low-relevance chunks were included in the context window. No
   metadata-based re-ranking existed, so a general "medication safety" chunk could
   outrank a specific "diabetes medication" chunk for a diabetes query.
-- Fix: Added hard similarity threshold (configurable, default 0.78) to discard
-  low-relevance matches. Implemented metadata-aware re-ranking that boosts chunks
+- Fix: Added hard cosine similarity threshold (configurable, default 0.844) to
+  discard low-relevance matches. Implemented metadata-aware re-ranking that boosts chunks
   whose category/tags match the query intent. Added context window budget tracking
   to prevent exceeding the LLM's effective context window.
 """
 
+import asyncio
+import hashlib
+import heapq
+import threading
+import time
 import structlog
+import numpy as np
+from collections import OrderedDict
 from dataclasses import dataclass
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
@@ -22,8 +29,16 @@ from config import get_settings
 
 logger = structlog.get_logger(__name__)
 
+# Chroma distance -> cosine similarity for unit-norm vectors, per index space.
+# Chroma's l2 is the squared distance, 2 - 2cos; ip is 1 - dot.
+_COSINE_FROM_DISTANCE = {
+    "cosine": lambda d: 1.0 - d,
+    "ip": lambda d: 1.0 - d,
+    "l2": lambda d: 1.0 - d / 2.0,
+}
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class RetrievalResult:
     text: str
     score: float
@@ -38,12 +53,38 @@ class ClinicalVectorStore:
         self._similarity_threshold = settings.rag_similarity_threshold
         self._top_k = settings.rag_top_k
         self._max_context_tokens = settings.rag_max_context_tokens
+        self._exact_search_max_rows = settings.rag_exact_search_max_rows
+        self._index_batch_size = settings.chroma_index_batch_size
 
         self._store = Chroma(
             collection_name=settings.chroma_collection_name,
             embedding_function=embedding_manager.langchain_embeddings,
             persist_directory=settings.chroma_persist_dir,
+            collection_metadata={
+                "hnsw:space": "cosine",
+                "hnsw:M": settings.rag_hnsw_m,
+                "hnsw:construction_ef": settings.rag_hnsw_construction_ef,
+                "hnsw:search_ef": settings.rag_ef_search,
+            },
         )
+
+        # In-memory mirror of the collection for exact search: one contiguous
+        # (N, d) float32 matrix of unit-norm rows, scored with a single matvec.
+        # Above rag_exact_search_max_rows the mirror is dropped and queries go
+        # to Chroma's HNSW index instead.
+        self._matrix: np.ndarray | None = None
+        self._documents: list[Document] = []
+        self._use_ann: bool | None = None
+
+        # Raw search results keyed by normalized query text and fetch size.
+        # Patient utterances cluster around a few intents, so repeats skip
+        # the embedding call and the search entirely.
+        self._query_cache: OrderedDict[bytes, tuple[float, list]] = OrderedDict()
+        self._query_cache_size = settings.rag_query_cache_size
+        self._query_cache_ttl = settings.rag_query_cache_ttl_s
+        self._cache_lock = threading.RLock()
+        # Searches in progress, so identical concurrent queries share one.
+        self._inflight: dict[bytes, asyncio.Task] = {}
         logger.info(
             "vector_store_initialized",
             collection=settings.chroma_collection_name,
@@ -54,129 +95,333 @@ class ClinicalVectorStore:
         if not chunks:
             return 0
 
-        documents = [
-            Document(page_content=chunk.text, metadata=chunk.metadata)
-            for chunk in chunks
-        ]
-
+        texts = [chunk.text for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
         ids = [
             f"{chunk.metadata.get('source_id', 'unknown')}_{i}"
             for i, chunk in enumerate(chunks)
         ]
 
-        self._store.add_documents(documents, ids=ids)
+        # Embed through the EmbeddingManager (batched, concurrent, cached)
+        # and hand Chroma precomputed vectors instead of letting it call the
+        # embedding function per add.
+        vectors = await self._embedding_manager.embed_documents(texts)
+
+        # Chroma calls are synchronous; they run in worker threads so other
+        # calls keep progressing on the event loop.
+        batch = self._index_batch_size
+        for i in range(0, len(texts), batch):
+            await asyncio.to_thread(
+                self._store._collection.upsert,
+                ids=ids[i : i + batch],
+                documents=texts[i : i + batch],
+                metadatas=metadatas[i : i + batch],
+                embeddings=vectors[i : i + batch],
+            )
+        await asyncio.to_thread(self._load_matrix)
+        self._clear_query_cache()
 
         logger.info("chunks_indexed", count=len(chunks))
         return len(chunks)
 
+    def _load_matrix(self) -> None:
+        """
+        Rebuild the in-memory embedding matrix from the Chroma collection, or
+        switch to ANN search if the collection is too large for brute force.
+
+        Blocking; run it in a worker thread. The new state is assigned only
+        once fully built so concurrent searches never see a partial mirror.
+        """
+        count = self._store._collection.count()
+        if count > self._exact_search_max_rows:
+            self._matrix, self._documents, self._use_ann = None, [], True
+            logger.info("ann_search_enabled", rows=count)
+            return
+
+        data = self._store._collection.get(
+            include=["embeddings", "documents", "metadatas"]
+        )
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])
+        ]
+        if not documents:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        else:
+            matrix = self._embedding_manager.normalize_batch(
+                np.asarray(data["embeddings"], dtype=np.float32)
+            )
+        self._matrix, self._documents, self._use_ann = matrix, documents, False
+        if documents:
+            logger.info("embedding_matrix_loaded", rows=len(documents))
+
     async def retrieve(
         self,
         query: str,
         category_hint: str | None = None,
         tag_hints: list[str] | None = None,
         top_k: int | None = None,
+        query_embedding: np.ndarray | None = None,
     ) -> list[RetrievalResult]:
         """
         Retrieve relevant clinical content with threshold filtering
         and metadata-aware re-ranking.
+
+        If the caller already holds the query embedding it can pass it in to
+        skip the embedding round trip.
+        """
+        raw_results = await self.search(query, top_k, query_embedding)
+        return self.rank(raw_results, query, category_hint, tag_hints, top_k)
+
+    async def search(
+        self,
+        query: str,
+        top_k: int | None = None,
+        query_embedding: np.ndarray | None = None,
+    ) -> list[tuple[Document, float]]:
+        """
+        Dense similarity search without intent hints. Returns raw
+        (document, cosine similarity) pairs for `rank` to filter and re-rank,
+        so the search can run concurrently with intent classification.
         """
         k = top_k or self._top_k
         fetch_k = k * 3  # over-fetch to allow filtering
 
-        raw_results = self._store.similarity_search_with_relevance_scores(
-            query, k=fetch_k
-        )
+        cache_key = self._query_cache_key(query, fetch_k)
+        cached = self._query_cache_get(cache_key)
+        if cached is not None:
+            return cached
 
-        filtered = []
-        for doc, score in raw_results:
-            if score < self._similarity_threshold:
-                logger.debug(
-                    "chunk_below_threshold",
-                    score=round(score, 4),
-                    source=doc.metadata.get("source_id"),
-                    threshold=self._similarity_threshold,
-                )
-                continue
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(
+                self._search_and_cache(cache_key, query, fetch_k, query_embedding)
+            )
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        # Shielded so one caller's cancellation doesn't fail the others.
+        return await asyncio.shield(task)
+
+    async def _search_and_cache(
+        self,
+        cache_key: bytes,
+        query: str,
+        fetch_k: int,
+        query_embedding: np.ndarray | None,
+    ) -> list[tuple[Document, float]]:
+        results = await self._search_uncached(query, fetch_k, query_embedding)
+        self._query_cache_put(cache_key, results)
+        return results
+
+    async def _search_uncached(
+        self,
+        query: str,
+        fetch_k: int,
+        query_embedding: np.ndarray | None,
+    ) -> list[tuple[Document, float]]:
+        if self._use_ann is None:
+            await asyncio.to_thread(self._load_matrix)
+
+        if query_embedding is None:
+            query_embedding = await self._embedding_manager.embed_text(query)
+
+        if self._use_ann:
+            return await asyncio.to_thread(self._search_ann, query_embedding, fetch_k)
+        if not self._documents:
+            return []
+
+        # Rows and query are unit-norm, so this is the cosine similarity.
+        sims = self._matrix @ np.asarray(query_embedding, dtype=np.float32)
+        fetch_k = min(fetch_k, len(sims))
+        top = np.argpartition(-sims, fetch_k - 1)[:fetch_k]
+        top = top[np.argsort(-sims[top])]
+
+        return [(self._documents[i], float(sims[i])) for i in top]
+
+    def _query_cache_key(self, query: str, fetch_k: int) -> bytes:
+        normalized = query.strip().lower().encode("utf-8")
+        digest = hashlib.blake2b(normalized, digest_size=16).digest()
+        return digest + fetch_k.to_bytes(4, "big")
+
+    def _query_cache_get(self, cache_key: bytes) -> list[tuple[Document, float]] | None:
+        with self._cache_lock:
+            entry = self._query_cache.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del self._query_cache[cache_key]
+                return None
+            self._query_cache.move_to_end(cache_key)
+            return results
+
+    def _query_cache_put(
+        self, cache_key: bytes, results: list[tuple[Document, float]]
+    ) -> None:
+        with self._cache_lock:
+            self._query_cache[cache_key] = (time.monotonic() + self._query_cache_ttl, results)
+            self._query_cache.move_to_end(cache_key)
+            while len(self._query_cache) > self._query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def _clear_query_cache(self) -> None:
+        with self._cache_lock:
+            self._query_cache.clear()
 
-            boosted_score = self._apply_metadata_boost(
-                score, doc.metadata, category_hint, tag_hints
+    def _search_ann(
+        self, query_embedding: np.ndarray, fetch_k: int
+    ) -> list[tuple[Document, float]]:
+        """
+        Approximate search through Chroma's HNSW index. Distances are mapped
+        back to cosine similarity so the threshold means the same on both
+        search paths, whatever space a persisted collection was built with.
+        """
+        # Collections created without metadata report None; Chroma's
+        # default space is l2.
+        metadata = self._store._collection.metadata or {}
+        to_cosine = _COSINE_FROM_DISTANCE[metadata.get("hnsw:space", "l2")]
+        return [
+            (doc, to_cosine(distance))
+            for doc, distance in self._store.similarity_search_by_vector_with_relevance_scores(
+                query_embedding.tolist(), k=fetch_k
+            )
+        ]
+
+    def rank(
+        self,
+        raw_results: list[tuple[Document, float]],
+        query: str,
+        category_hint: str | None = None,
+        tag_hints: list[str] | None = None,
+        top_k: int | None = None,
+    ) -> list[RetrievalResult]:
+        """Drop duplicates, then apply the threshold, metadata boost, and token budget."""
+        k = top_k or self._top_k
+
+        candidates = self._deduplicate(raw_results)
+        scores = np.fromiter(
+            (score for _, score in candidates), dtype=np.float64, count=len(candidates)
+        )
+        keep = scores >= self._similarity_threshold
+        below = scores[~keep]
+        if below.size:
+            # One summary line rather than a log event per discarded chunk.
+            logger.debug(
+                "chunks_below_threshold",
+                count=int(below.size),
+                min_score=round(float(below.min()), 4),
+                max_score=round(float(below.max()), 4),
+                threshold=self._similarity_threshold,
             )
 
-            filtered.append(RetrievalResult(
+        kept = np.flatnonzero(keep)
+        boosted = scores[kept]
+        # Unstructured voice queries often carry no hints; skip the metadata
+        # walk entirely for them.
+        if category_hint or tag_hints:
+            boosted += self._metadata_boosts(
+                [candidates[i][0].metadata for i in kept], category_hint, tag_hints
+            )
+        np.minimum(boosted, 1.0, out=boosted)
+
+        # Partial top-k selection; like a stable sort, equal scores keep
+        # their search order.
+        boosted_scores = boosted.tolist()
+        order = heapq.nlargest(k, range(len(boosted_scores)), key=boosted_scores.__getitem__)
+        # Walk the top k best-first, stopping once the context token budget
+        # would be exceeded.
+        budget_results: list[RetrievalResult] = []
+        total_tokens = 0
+        for j in order:
+            doc = candidates[kept[j]][0]
+            token_estimate = estimate_tokens(doc.page_content)
+            if total_tokens + token_estimate > self._max_context_tokens:
+                logger.info(
+                    "context_budget_reached",
+                    included=len(budget_results),
+                    total_tokens=total_tokens,
+                    budget=self._max_context_tokens,
+                )
+                break
+            budget_results.append(RetrievalResult(
                 text=doc.page_content,
-                score=boosted_score,
+                score=boosted_scores[j],
                 metadata=doc.metadata,
-                token_estimate=estimate_tokens(doc.page_content),
+                token_estimate=token_estimate,
             ))
-
-        filtered.sort(key=lambda r: r.score, reverse=True)
-
-        budget_results = self._apply_token_budget(filtered[:k])
+            total_tokens += token_estimate
 
         logger.info(
             "retrieval_complete",
             query_length=len(query),
             raw_results=len(raw_results),
-            after_threshold=len(filtered),
+            dedup_dropped=len(raw_results) - len(candidates),
+            after_threshold=len(kept),
             after_budget=len(budget_results),
             category_hint=category_hint,
         )
 
         return budget_results
 
-    def _apply_metadata_boost(
+    def _deduplicate(
+        self, raw_results: list[tuple[Document, float]]
+    ) -> list[tuple[Document, float]]:
+        """
+        Drop repeated chunks (e.g. the same passage indexed from overlapping
+        windows), keeping the first and therefore highest-scoring copy.
+        """
+        # Key on the full text: chunks from one section often share a long
+        # heading or boilerplate prefix and must not collapse into one.
+        seen: set[str] = set()
+        unique = []
+        for doc, score in raw_results:
+            if doc.page_content in seen:
+                continue
+            seen.add(doc.page_content)
+            unique.append((doc, score))
+        return unique
+
+    def _metadata_boosts(
         self,
-        score: float,
-        metadata: dict,
+        metadatas: list[dict],
         category_hint: str | None,
         tag_hints: list[str] | None,
-    ) -> float:
-        """Boost scores for chunks whose metadata aligns with query intent."""
-        boost = 0.0
+    ) -> np.ndarray:
+        """Score boosts for chunks whose metadata aligns with query intent."""
+        boosts = np.zeros(len(metadatas), dtype=np.float64)
 
-        if category_hint and metadata.get("category") == category_hint:
-            boost += 0.05
+        if category_hint:
+            boosts += 0.05 * np.fromiter(
+                (m.get("category") == category_hint for m in metadatas),
+                dtype=np.float64,
+                count=len(metadatas),
+            )
 
         if tag_hints:
-            chunk_tags = set(metadata.get("tags", []))
-            overlap = chunk_tags.intersection(set(tag_hints))
-            if overlap:
-                boost += 0.02 * len(overlap)
-
-        return min(score + boost, 1.0)
-
-    def _apply_token_budget(
-        self, results: list[RetrievalResult]
-    ) -> list[RetrievalResult]:
-        """Trim results to fit within the context window token budget."""
-        budgeted: list[RetrievalResult] = []
-        total_tokens = 0
-
-        for result in results:
-            if total_tokens + result.token_estimate > self._max_context_tokens:
-                logger.info(
-                    "context_budget_reached",
-                    included=len(budgeted),
-                    total_tokens=total_tokens,
-                    budget=self._max_context_tokens,
-                )
-                break
-            budgeted.append(result)
-            total_tokens += result.token_estimate
+            tag_hint_set = frozenset(tag_hints)
+            boosts += 0.02 * np.fromiter(
+                (len(tag_hint_set.intersection(m.get("tags", []))) for m in metadatas),
+                dtype=np.float64,
+                count=len(metadatas),
+            )
 
-        return budgeted
+        return boosts
 
     async def get_collection_stats(self) -> dict:
         collection = self._store._collection
         return {
             "name": collection.name,
-            "count": collection.count(),
+            "count": await asyncio.to_thread(collection.count),
         }
 
     async def clear(self) -> None:
         """Remove all documents. Use during re-indexing."""
         collection = self._store._collection
-        ids = collection.get()["ids"]
+        ids = (await asyncio.to_thread(collection.get))["ids"]
         if ids:
-            collection.delete(ids=ids)
+            await asyncio.to_thread(collection.delete, ids=ids)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._documents = []
+        self._use_ann = False
+        self._clear_query_cache()
         logger.info("vector_store_cleared")
@@ -7,7 +7,7 @@ CLINICAL_SYSTEM_PROMPT = """\
 You are a HIPAA-compliant healthcare voice assistant conducting patient outreach calls.
 
 CRITICAL RULES:
-1. ONLY use information provided in the clinical context below. Never fabricate medical data.
+1. ONLY use information provided in the clinical context message. Never fabricate medical data.
 2. Follow the exact template structure with section markers like [IF YES], [CLOSING], etc.
 3. NEVER diagnose conditions, prescribe medications, or recommend dosage changes.
 4. ALWAYS include safety language directing patients to contact their provider for concerns.
@@ -21,7 +21,12 @@ CONVERSATION STYLE FOR VOICE:
 - Pause points: use short sentences so TTS can deliver naturally
 - Acknowledge patient responses before moving to the next point
 - If the patient interrupts, address their concern before continuing the script
+"""
 
+# Kept separate from CLINICAL_SYSTEM_PROMPT and sent after the conversation
+# history: the context changes every turn, so placing it last keeps the
+# static instructions + history as a stable prefix for provider prompt caching.
+CLINICAL_CONTEXT_PROMPT = """\
 {clinical_context}
 """
 
@@ -36,6 +41,11 @@ If the query doesn't match any available clinical content, politely explain that
 need to connect them with their care team for that specific question.
 """
 
+# Prefixes of the synthetic user inputs the voice client sends in place of a
+# transcript, so the chain can recognise them.
+INTERRUPTION_MARKER = "[The patient interrupted"
+SILENCE_CHECKIN_MARKER = "[SYSTEM: User has been silent"
+
 INTERRUPTION_RESPONSE_PROMPT = """\
 {interruption_context}
 
@@ -50,3 +60,10 @@ The patient has been silent for a while during the call. Generate a brief,
 warm check-in message (1-2 sentences). Do NOT repeat previous information. 
 Simply ask if they're still there and if they have any questions.
 """
+
+HISTORY_SUMMARY_PROMPT = """\
+Summarize the following conversation between a patient and a clinical voice 
+assistant. Preserve every clinical fact the patient shared or was given 
+(medications, symptoms, readings, appointments, and follow-up actions). 
+Omit greetings and small talk. Keep the summary under 200 words.
+"""
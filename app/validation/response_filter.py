@@ -15,10 +15,17 @@ FIX APPLIED: Responses deviating from approved clinical script formats
   4. Falls back to a safe default response if all retries fail
 """
 
+import asyncio
 import structlog
+from functools import lru_cache
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
-from app.validation.template_validator import ClinicalOutputValidator, ValidationResult
+from app.openai_http import get_openai_http_client
+from app.validation.template_validator import (
+    ClinicalOutputValidator,
+    ValidationIssue,
+    ValidationResult,
+)
 from config import get_settings
 
 logger = structlog.get_logger(__name__)
@@ -47,17 +54,27 @@ SAFE_FALLBACK_RESPONSE = (
 )
 
 
+@lru_cache(maxsize=None)
+def _get_correction_llm(model: str, api_key: str) -> ChatOpenAI:
+    """One correction client per model, shared by every filter instance."""
+    return ChatOpenAI(
+        model=model,
+        openai_api_key=api_key,
+        temperature=0.1,
+        max_tokens=1500,
+        http_async_client=get_openai_http_client(),
+    )
+
+
 class ClinicalResponseFilter:
     def __init__(self):
         settings = get_settings()
         self._validator = ClinicalOutputValidator()
-        self._llm = ChatOpenAI(
-            model=settings.openai_chat_model,
-            openai_api_key=settings.openai_api_key,
-            temperature=0.1,
-            max_tokens=1500,
-        )
+        self._llm = _get_correction_llm(settings.openai_chat_model, settings.openai_api_key)
         self._max_correction_attempts = 2
+        # The first correction round races one candidate per temperature and
+        # keeps the first that validates; later rounds use only the first.
+        self._correction_temperatures = (0.1, 0.3)
 
     async def filter_response(
         self,
@@ -86,12 +103,13 @@ class ClinicalResponseFilter:
                 issues=[i.code for i in result.issues],
             )
 
-            corrected = await self._attempt_correction(
-                response, result, expected_sections
+            temperatures = (
+                self._correction_temperatures if attempt == 1
+                else self._correction_temperatures[:1]
             )
-
-            result = self._validator.validate(
-                corrected, template_id, expected_sections, required_fields
+            corrected, result = await self._race_corrections(
+                response, result, template_id, expected_sections,
+                required_fields, temperatures,
             )
 
             if result.is_valid and result.sanitized_output:
@@ -112,11 +130,72 @@ class ClinicalResponseFilter:
         fallback_result = self._validator.validate(SAFE_FALLBACK_RESPONSE)
         return SAFE_FALLBACK_RESPONSE, fallback_result
 
+    def screen_partial(self, text: str) -> list[ValidationIssue]:
+        """
+        Screen a fragment of a streamed response (e.g. one sentence) that is
+        too short for full validation. Returns disallowed-content issues only.
+        """
+        return self._validator.find_disallowed_content(text)
+
+    def sanitize_partial(self, text: str) -> str:
+        """
+        Remove role prefixes and internal notes from a streamed fragment.
+        Returns an empty string if nothing patient-facing remains.
+        """
+        return self._validator.sanitize_fragment(text)
+
+    async def _race_corrections(
+        self,
+        response: str,
+        validation_result: ValidationResult,
+        template_id: str | None,
+        expected_sections: list[str] | None,
+        required_fields: list[str] | None,
+        temperatures: tuple[float, ...],
+    ) -> tuple[str, ValidationResult]:
+        """
+        Request one correction per temperature concurrently and return the
+        first that passes validation, cancelling the rest. If none pass,
+        returns the last candidate to finish. A candidate whose LLM call
+        fails is skipped; the error is raised only if every candidate failed.
+        """
+        tasks = [
+            asyncio.create_task(self._attempt_correction(
+                response, validation_result, expected_sections, temperature
+            ))
+            for temperature in temperatures
+        ]
+        corrected: str | None = None
+        error: Exception | None = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    candidate = await next_done
+                except Exception as e:
+                    logger.warning("correction_candidate_failed", error=str(e))
+                    error = e
+                    continue
+
+                corrected = candidate
+                result = self._validator.validate(
+                    corrected, template_id, expected_sections, required_fields
+                )
+                if result.is_valid and result.sanitized_output:
+                    break
+
+            if corrected is None:
+                raise error
+            return corrected, result
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def _attempt_correction(
         self,
         original_response: str,
         validation_result: ValidationResult,
         expected_sections: list[str] | None,
+        temperature: float = 0.1,
     ) -> str:
         issues_summary = "\n".join(
             f"- [{i.severity.value}] {i.code}: {i.message}"
@@ -144,5 +223,5 @@ class ClinicalResponseFilter:
             HumanMessage(content=correction_prompt),
         ]
 
-        result = await self._llm.ainvoke(messages)
+        result = await self._llm.bind(temperature=temperature).ainvoke(messages)
         return result.content
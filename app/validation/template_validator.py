@@ -17,8 +17,10 @@ FIX APPLIED: Output filtering not enforcing template structure
 
 import re
 import structlog
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from enum import Enum
+from itertools import islice
 
 logger = structlog.get_logger(__name__)
 
@@ -29,7 +31,7 @@ class ValidationSeverity(str, Enum):
     INFO = "info"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ValidationIssue:
     severity: ValidationSeverity
     code: str
@@ -37,7 +39,7 @@ class ValidationIssue:
     location: str | None = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ValidationResult:
     is_valid: bool
     conformance_score: float
@@ -45,6 +47,12 @@ class ValidationResult:
     sanitized_output: str | None = None
 
 
+ABSOLUTE_PROMISE_TERMS = ("guaranteed", "guarantee", "promise", "certain", "definitely will")
+_ABSOLUTE_PROMISE_PATTERN = r"\b(?:{})\b".format("|".join(
+    r"\s+".join(re.escape(word) for word in term.split())
+    for term in ABSOLUTE_PROMISE_TERMS
+))
+
 DISALLOWED_PATTERNS = [
     (r"\b\d+\s*mg\b", "specific_dosage",
      "Response contains a specific dosage not sourced from the template"),
@@ -52,23 +60,72 @@ DISALLOWED_PATTERNS = [
      "Response appears to make an unsolicited diagnosis"),
     (r"\bstop\s+taking\b", "stop_medication_advice",
      "Response advises stopping medication without provider instruction"),
-    (r"\b(?:guarantee|promise|certain|definitely\s+will)\b", "absolute_promise",
+    (_ABSOLUTE_PROMISE_PATTERN, "absolute_promise",
      "Response makes absolute medical promises"),
 ]
 
+# The gap between the two words of each phrase is bounded so a long line
+# with many "contact"/"call" words but no match fails in linear time.
 REQUIRED_SAFETY_PHRASES = [
-    "contact.*provider",
-    "call.*(?:doctor|clinic|emergency)",
-    "seek.*(?:care|medical|attention)",
-    "follow.*up",
+    r"contact[^\n]{0,80}?provider",
+    r"call[^\n]{0,80}?(?:doctor|clinic|emergency)",
+    r"seek[^\n]{0,80}?(?:care|medical|attention)",
+    r"follow[^\n]{0,80}?up",
 ]
 
+# Each pattern set is compiled into one alternation of lookaheads so a single
+# finditer pass reports every pattern's first match, including matches that
+# overlap another pattern's match. The patterns start with distinct words, so
+# at most one alternative can match at any given position.
+_DISALLOWED_RE = re.compile(
+    "|".join(f"(?=(?P<{code}>{pattern}))" for pattern, code, _ in DISALLOWED_PATTERNS),
+    re.IGNORECASE,
+)
+_DISALLOWED_MESSAGES = {code: message for _, code, message in DISALLOWED_PATTERNS}
+
+# Every disallowed pattern contains one of these words, so text without any
+# of them (the common case) skips the regex scan. Text is casefolded, plus
+# the two characters casefold leaves apart from an ASCII "i" that
+# re.IGNORECASE still matches to it.
+_DISALLOWED_KEYWORDS = (
+    "mg", "diagnos", "stop", "guarantee", "promise", "certain", "definitely",
+)
+_KEYWORD_FOLD = str.maketrans({"\u0131": "i", "\u0307": None})
+
+_SAFETY_RE = re.compile(
+    "|".join(
+        f"(?=(?P<safety_{i}>{pattern}))" for i, pattern in enumerate(REQUIRED_SAFETY_PHRASES)
+    ),
+    re.IGNORECASE,
+)
+
+# Any {name} placeholder; a brace-free name appears as "{name}" in the text
+# exactly when it is among this pattern's captures.
+_PLACEHOLDER_RE = re.compile(r"\{([^{}]*)\}")
+
+_WORD_RE = re.compile(r"\S+")
+MIN_WORD_COUNT = 20
+
+VALIDATION_CACHE_SIZE = 128
+
+# Conformance score weights; each check's score is already a ratio of
+# counts tallied during its own pass.
+SECTION_WEIGHT = 0.4
+FIELD_WEIGHT = 0.3
+SAFETY_WEIGHT = 0.3
+
+_ROLE_PREFIX_RE = re.compile(r"(?:^|\n)\s*(?:System|Assistant|AI):?\s*")
+_INTERNAL_NOTE_RE = re.compile(
+    r"(?:^|\n)\s*\[(?:INTERNAL|DEBUG|NOTE)\].*$", re.MULTILINE
+)
+
 
 class ClinicalOutputValidator:
     """Validates LLM output against clinical template structure and safety rules."""
 
     def __init__(self, conformance_threshold: float = 0.6):
         self._conformance_threshold = conformance_threshold
+        self._result_cache: OrderedDict[tuple, ValidationResult] = OrderedDict()
 
     def validate(
         self,
@@ -76,6 +133,37 @@ class ClinicalOutputValidator:
         template_id: str | None = None,
         expected_sections: list[str] | None = None,
         required_fields: list[str] | None = None,
+    ) -> ValidationResult:
+        """
+        Validate an output, reusing the result for an identical recent call.
+
+        Each caller gets its own issues list so a cached result can't be
+        changed through a returned one.
+        """
+        key = (
+            output,
+            template_id,
+            tuple(expected_sections or ()),
+            tuple(required_fields or ()),
+        )
+        result = self._result_cache.get(key)
+        if result is not None:
+            self._result_cache.move_to_end(key)
+            logger.debug("validation_cache_hit", template_id=template_id)
+        else:
+            result = self._validate(output, template_id, expected_sections, required_fields)
+            self._result_cache[key] = result
+            if len(self._result_cache) > VALIDATION_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+
+        return replace(result, issues=list(result.issues))
+
+    def _validate(
+        self,
+        output: str,
+        template_id: str | None,
+        expected_sections: list[str] | None,
+        required_fields: list[str] | None,
     ) -> ValidationResult:
         issues: list[ValidationIssue] = []
 
@@ -85,11 +173,10 @@ class ClinicalOutputValidator:
         field_score = self._check_required_fields(output, required_fields, issues)
         safety_score = self._check_safety_language(output, issues)
 
-        weights = {"sections": 0.4, "fields": 0.3, "safety": 0.3}
         conformance_score = (
-            section_score * weights["sections"]
-            + field_score * weights["fields"]
-            + safety_score * weights["safety"]
+            section_score * SECTION_WEIGHT
+            + field_score * FIELD_WEIGHT
+            + safety_score * SAFETY_WEIGHT
         )
 
         has_errors = any(i.severity == ValidationSeverity.ERROR for i in issues)
@@ -115,24 +202,46 @@ class ClinicalOutputValidator:
 
         return result
 
+    def find_disallowed_content(self, output: str) -> list[ValidationIssue]:
+        """Run only the disallowed-content guardrails, e.g. on partial output."""
+        issues: list[ValidationIssue] = []
+        self._check_disallowed_content(output, issues)
+        return issues
+
+    def sanitize_fragment(self, output: str) -> str:
+        """Strip system artifacts from partial output, e.g. one streamed sentence."""
+        return self._sanitize_output(output)
+
     def _check_disallowed_content(
         self, output: str, issues: list[ValidationIssue]
     ) -> None:
-        for pattern, code, message in DISALLOWED_PATTERNS:
-            matches = re.findall(pattern, output, re.IGNORECASE)
-            if matches:
+        folded = output.casefold().translate(_KEYWORD_FOLD)
+        if not any(keyword in folded for keyword in _DISALLOWED_KEYWORDS):
+            return
+
+        first_matches: dict[str, str] = {}
+        for m in _DISALLOWED_RE.finditer(output):
+            first_matches.setdefault(m.lastgroup, m.group(m.lastgroup))
+            if len(first_matches) == len(DISALLOWED_PATTERNS):
+                break
+
+        # Report in DISALLOWED_PATTERNS order, as the per-pattern scan did.
+        for _, code, message in DISALLOWED_PATTERNS:
+            if code in first_matches:
                 issues.append(ValidationIssue(
                     severity=ValidationSeverity.ERROR,
                     code=code,
-                    message=f"{message}. Found: '{matches[0]}'",
-                    location=f"match: {matches[0]}",
+                    message=f"{message}. Found: '{first_matches[code]}'",
+                    location=f"match: {first_matches[code]}",
                 ))
 
     def _check_minimum_length(
         self, output: str, issues: list[ValidationIssue]
     ) -> None:
-        word_count = len(output.split())
-        if word_count < 20:
+        # Only whether the count reaches the minimum matters, so stop there
+        # instead of splitting the whole response into a list.
+        word_count = sum(1 for _ in islice(_WORD_RE.finditer(output), MIN_WORD_COUNT))
+        if word_count < MIN_WORD_COUNT:
             issues.append(ValidationIssue(
                 severity=ValidationSeverity.ERROR,
                 code="too_short",
@@ -149,12 +258,12 @@ class ClinicalOutputValidator:
         if not expected_sections:
             return 1.0
 
+        # Markers are literal, so a case-insensitive substring test suffices.
+        folded = output.casefold()
+
         found = 0
         for section in expected_sections:
-            pattern = re.compile(
-                rf"\[{re.escape(section)}\]", re.IGNORECASE
-            )
-            if pattern.search(output):
+            if f"[{section.casefold()}]" in folded:
                 found += 1
             else:
                 issues.append(ValidationIssue(
@@ -176,10 +285,12 @@ class ClinicalOutputValidator:
         if not required_fields:
             return 1.0
 
+        unfilled = set(_PLACEHOLDER_RE.findall(output)) if "{" in output else ()
+
         filled = 0
         for field_name in required_fields:
-            placeholder = f"{{{field_name}}}"
-            if placeholder in output:
+            if field_name in unfilled:
+                placeholder = f"{{{field_name}}}"
                 issues.append(ValidationIssue(
                     severity=ValidationSeverity.ERROR,
                     code="unfilled_placeholder",
@@ -194,10 +305,12 @@ class ClinicalOutputValidator:
     def _check_safety_language(
         self, output: str, issues: list[ValidationIssue]
     ) -> float:
-        found = sum(
-            1 for pattern in REQUIRED_SAFETY_PHRASES
-            if re.search(pattern, output, re.IGNORECASE)
-        )
+        matched: set[str] = set()
+        for m in _SAFETY_RE.finditer(output):
+            matched.add(m.lastgroup)
+            if len(matched) == len(REQUIRED_SAFETY_PHRASES):
+                break
+        found = len(matched)
 
         score = found / len(REQUIRED_SAFETY_PHRASES) if REQUIRED_SAFETY_PHRASES else 1.0
 
@@ -212,13 +325,6 @@ class ClinicalOutputValidator:
 
     def _sanitize_output(self, output: str) -> str:
         """Remove any residual system-level artifacts from the response."""
-        sanitized = re.sub(
-            r"(?:^|\n)\s*(?:System|Assistant|AI):?\s*", "\n", output
-        )
-        sanitized = re.sub(
-            r"(?:^|\n)\s*\[(?:INTERNAL|DEBUG|NOTE)\].*$",
-            "",
-            sanitized,
-            flags=re.MULTILINE,
-        )
+        sanitized = _ROLE_PREFIX_RE.sub("\n", output)
+        sanitized = _INTERNAL_NOTE_RE.sub("", sanitized)
         return sanitized.strip()
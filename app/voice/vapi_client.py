@@ -37,35 +37,97 @@ FIX APPLIED: Response retry logic failing after user interruptions
 """
 
 import asyncio
+import inspect
 import time
 import structlog
 import httpx
-from enum import Enum
+import orjson
+from collections import deque
+from enum import IntEnum
 from dataclasses import dataclass, field
-from typing import Any, Callable, Coroutine
+from typing import Any, AsyncIterator, Awaitable, Callable
+from app.openai_http import HTTP2_AVAILABLE
+from app.templates.prompts import INTERRUPTION_MARKER, SILENCE_CHECKIN_MARKER
 from config import get_settings
 
 logger = structlog.get_logger(__name__)
 
+# Either a coroutine returning the full response, or an async generator
+# yielding it in pieces (e.g. ClinicalLLMChain.stream_response).
+ResponseCallback = Callable[[str], Awaitable[str] | AsyncIterator[str]]
 
-class SpeechState(str, Enum):
-    IDLE = "idle"
-    LISTENING = "listening"
-    PROCESSING = "processing"
-    SPEAKING = "speaking"
-    INTERRUPTED = "interrupted"
-    WARNING = "warning"
-    DISCONNECTED = "disconnected"
+_http_clients: dict[tuple[str, str], httpx.AsyncClient] = {}
 
 
-class SilencePhase(str, Enum):
-    INITIAL = "initial"
-    MID_CONVERSATION = "mid_conversation"
-    TTS_PLAYBACK = "tts_playback"
-    SYSTEM_PROCESSING = "system_processing"
+def _get_http_client(base_url: str, api_key: str) -> httpx.AsyncClient:
+    """
+    Process-wide pooled client for the Vapi API, so every VapiVoiceClient
+    reuses the same warm connections (multiplexed over HTTP/2 when `h2` is
+    installed). A closed client is replaced on next use.
+    """
+    key = (base_url, api_key)
+    client = _http_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=50,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+        _http_clients[key] = client
+    return client
+
+
+async def close_vapi_http_clients() -> None:
+    """Close the pooled Vapi clients. Call once at application shutdown."""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+class SpeechState(IntEnum):
+    IDLE = 0
+    LISTENING = 1
+    PROCESSING = 2
+    SPEAKING = 3
+    INTERRUPTED = 4
+    WARNING = 5
+    DISCONNECTED = 6
 
 
-@dataclass
+class SilencePhase(IntEnum):
+    INITIAL = 0
+    MID_CONVERSATION = 1
+    TTS_PLAYBACK = 2
+    SYSTEM_PROCESSING = 3
+
+
+# String labels reported by get_conversation_state, indexed by enum value.
+_SPEECH_STATE_NAMES = tuple(state.name.lower() for state in SpeechState)
+_SILENCE_PHASE_NAMES = tuple(phase.name.lower() for phase in SilencePhase)
+
+# Speech states during which the silence monitor is paused.
+_SILENCE_PAUSED_MASK = (
+    1 << SpeechState.SPEAKING
+    | 1 << SpeechState.PROCESSING
+    | 1 << SpeechState.DISCONNECTED
+)
+
+# Interruption events kept per call for the audit trail; totals are tracked
+# separately so they stay exact past this bound.
+MAX_INTERRUPTION_HISTORY = 256
+
+
+@dataclass(slots=True)
 class InterruptionEvent:
     timestamp: float
     user_speech_fragment: str
@@ -73,7 +135,7 @@ class InterruptionEvent:
     retry_count: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationState:
     speech_state: SpeechState = SpeechState.IDLE
     silence_phase: SilencePhase = SilencePhase.INITIAL
@@ -82,7 +144,11 @@ class ConversationState:
     tts_active: bool = False
     turn_count: int = 0
     retry_count: int = 0
-    interruption_history: list[InterruptionEvent] = field(default_factory=list)
+    interruption_history: deque[InterruptionEvent] = field(
+        default_factory=lambda: deque(maxlen=MAX_INTERRUPTION_HISTORY)
+    )
+    interruption_count: int = 0
+    total_retry_count: int = 0
     pending_response: str | None = None
     conversation_id: str | None = None
 
@@ -95,6 +161,7 @@ class VapiVoiceClient:
         self._api_key = settings.vapi_api_key
         self._base_url = settings.vapi_base_url
         self._assistant_id = settings.vapi_assistant_id
+        self._phone_number_id = settings.vapi_phone_number_id
 
         self._silence_timeout_ms = settings.voice_silence_timeout_ms
         self._interruption_threshold_ms = settings.voice_interruption_threshold_ms
@@ -102,26 +169,73 @@ class VapiVoiceClient:
         self._retry_delay_ms = settings.voice_retry_delay_ms
 
         self._initial_silence_timeout_ms = 10000
+        # Silence timeout per SilencePhase, indexed by the phase value.
+        self._silence_timeouts_ms = tuple(
+            self._initial_silence_timeout_ms
+            if phase is SilencePhase.INITIAL
+            else self._silence_timeout_ms
+            for phase in SilencePhase
+        )
         self._warning_prompt = (
             "Are you still there? I want to make sure I can help you. "
             "If you need more time, just let me know."
         )
         self._speech_debounce_ms = 150
+        self._warning_grace_ms = 5000
 
         self._state = ConversationState()
+        # One monitor task lives for the whole call; starting, pausing and
+        # cancelling the timer only flip _silence_armed and set the wake event
+        # so the monitor re-reads its state instead of being recreated.
         self._silence_monitor_task: asyncio.Task | None = None
-        self._on_response_callback: Callable[
-            [str], Coroutine[Any, Any, str]
-        ] | None = None
-
-        self._http_client = httpx.AsyncClient(
-            base_url=self._base_url,
-            headers={
-                "Authorization": f"Bearer {self._api_key}",
-                "Content-Type": "application/json",
+        self._silence_armed = False
+        self._silence_wake = asyncio.Event()
+
+        # Last speech-update applied and its result. Vapi re-sends identical
+        # speech-updates in bursts; an exact repeat only refreshes the voice
+        # activity time and shares the earlier result. Any other event
+        # clears it, since it may have moved the state machine on.
+        self._last_speech_key: tuple[str, str] | None = None
+        self._last_speech_result: dict | None = None
+
+        # speech-update is applied inline by _dispatch_speech_update.
+        self._event_handlers: dict[str, Callable[[dict], Awaitable[dict | None]]] = {
+            "transcript": self._handle_transcript,
+        }
+        # These only update state and log, so they run without a coroutine.
+        self._sync_event_handlers: dict[str, Callable[[dict], dict | None]] = {
+            "hang": self._handle_hang,
+            "end-of-call-report": self._handle_end_of_call,
+            "function-call": self._handle_function_call,
+            "status-update": self._handle_status_update,
+        }
+        self._on_response_callback: ResponseCallback | None = None
+
+        self._assistant_overrides: dict[str, Any] = {
+            "silenceTimeoutSeconds": self._silence_timeout_ms / 1000,
+            "responseDelaySeconds": 0.4,
+            "interruptionsEnabled": True,
+            "backchannelingEnabled": True,
+            "model": {
+                "provider": "openai",
+                "model": settings.openai_chat_model,
+                "temperature": 0.3,
             },
-            timeout=30.0,
-        )
+            "voice": {
+                "provider": "11labs",
+                "voiceId": "21m00Tcm4TlvDq8ikWAM",
+                "stability": 0.7,
+                "similarityBoost": 0.8,
+            },
+            "transcriber": {
+                "provider": "deepgram",
+                "model": "nova-2-medical",
+                "language": "en",
+                "smartFormat": True,
+            },
+        }
+
+        self._http_client = _get_http_client(self._base_url, self._api_key)
 
         logger.info(
             "vapi_client_initialized",
@@ -130,11 +244,16 @@ class VapiVoiceClient:
             max_retries=self._max_retries,
         )
 
-    def set_response_callback(
-        self, callback: Callable[[str], Coroutine[Any, Any, str]]
-    ) -> None:
+    def set_response_callback(self, callback: ResponseCallback) -> None:
         self._on_response_callback = callback
 
+    async def _invoke_response_callback(self, text: str) -> str:
+        """Run the response callback, collecting streamed output if needed."""
+        result = self._on_response_callback(text)
+        if inspect.isawaitable(result):
+            return await result
+        return " ".join([piece async for piece in result])
+
     async def create_call(
         self,
         phone_number: str | None = None,
@@ -142,37 +261,14 @@ class VapiVoiceClient:
         metadata: dict | None = None,
     ) -> dict:
         """Create an outbound Vapi call with optimized voice settings."""
-        settings = get_settings()
-
+        # The overrides tree is shared across calls and never mutated.
         payload: dict[str, Any] = {
             "assistantId": self._assistant_id,
-            "assistantOverrides": {
-                "silenceTimeoutSeconds": self._silence_timeout_ms / 1000,
-                "responseDelaySeconds": 0.4,
-                "interruptionsEnabled": True,
-                "backchannelingEnabled": True,
-                "model": {
-                    "provider": "openai",
-                    "model": settings.openai_chat_model,
-                    "temperature": 0.3,
-                },
-                "voice": {
-                    "provider": "11labs",
-                    "voiceId": "21m00Tcm4TlvDq8ikWAM",
-                    "stability": 0.7,
-                    "similarityBoost": 0.8,
-                },
-                "transcriber": {
-                    "provider": "deepgram",
-                    "model": "nova-2-medical",
-                    "language": "en",
-                    "smartFormat": True,
-                },
-            },
+            "assistantOverrides": self._assistant_overrides,
         }
 
         if phone_number:
-            payload["phoneNumberId"] = settings.vapi_phone_number_id
+            payload["phoneNumberId"] = self._phone_number_id
             payload["customer"] = {"number": phone_number}
             if customer_name:
                 payload["customer"]["name"] = customer_name
@@ -180,12 +276,16 @@ class VapiVoiceClient:
         if metadata:
             payload["metadata"] = metadata
 
-        response = await self._http_client.post("/call", json=payload)
+        # The client's default headers already declare application/json.
+        response = await self._http_client.post("/call", content=orjson.dumps(payload))
         response.raise_for_status()
-        call_data = response.json()
+        call_data = orjson.loads(response.content)
 
-        self._state.conversation_id = call_data.get("id")
-        self._state.speech_state = SpeechState.IDLE
+        # Start each call from a clean slate so counters, interruption history
+        # and the silence monitor of the previous call don't carry over.
+        self._stop_silence_monitor()
+        self._state = ConversationState(conversation_id=call_data.get("id"))
+        self._last_speech_key = None
 
         logger.info(
             "call_created",
@@ -197,32 +297,56 @@ class VapiVoiceClient:
 
     async def handle_webhook_event(self, event: dict) -> dict | None:
         """Process Vapi webhook events with full state machine logic."""
-        event_type = event.get("message", {}).get("type", "")
+        message = event.get("message", {})
+        event_type = message.get("type", "")
+
+        if event_type == "speech-update":
+            # Monotonic, so wall-clock adjustments can't skew interruption
+            # timing. Applied inline so a transcript arriving next always
+            # sees the state this update produced.
+            return await self._dispatch_speech_update(message, time.monotonic())
+
+        # Interim transcripts arrive several times a second while the patient
+        # speaks and are never acted on; drop them before dispatch.
+        if event_type == "transcript" and message.get("transcriptType") != "final":
+            return None
 
-        handlers = {
-            "speech-update": self._handle_speech_update,
-            "transcript": self._handle_transcript,
-            "hang": self._handle_hang,
-            "end-of-call-report": self._handle_end_of_call,
-            "function-call": self._handle_function_call,
-            "status-update": self._handle_status_update,
-        }
+        self._last_speech_key = None
+
+        sync_handler = self._sync_event_handlers.get(event_type)
+        if sync_handler:
+            return sync_handler(message)
 
-        handler = handlers.get(event_type)
+        handler = self._event_handlers.get(event_type)
         if handler:
-            return await handler(event.get("message", {}))
+            return await handler(message)
 
         logger.debug("unhandled_webhook_event", type=event_type)
         return None
 
-    async def _handle_speech_update(self, message: dict) -> dict | None:
+    async def _dispatch_speech_update(self, message: dict, now: float) -> dict | None:
+        """
+        Run the speech state machine, collapsing exact repeats of the previous
+        speech-update. A repeat skips the transition but still records the
+        voice activity, so the silence timer measures from the latest event.
+        """
+        key = (message.get("role", ""), message.get("status", ""))
+        if key == self._last_speech_key:
+            if key[0] == "user":
+                self._reset_silence_timer(now)
+            return self._last_speech_result
+
+        result = await self._handle_speech_update(message, now)
+        self._last_speech_key, self._last_speech_result = key, result
+        return result
+
+    async def _handle_speech_update(self, message: dict, now: float) -> dict | None:
         """
         State machine for speech detection with debounce and
         interruption logic.
         """
         status = message.get("status", "")
         role = message.get("role", "")
-        now = time.time()
 
         if role == "user":
             if status == "started":
@@ -240,15 +364,14 @@ class VapiVoiceClient:
             elif status == "stopped":
                 self._state.tts_active = False
                 self._state.speech_state = SpeechState.LISTENING
-                self._resume_silence_timer()
+                self._resume_silence_timer(now)
                 logger.debug("tts_playback_stopped")
 
         return None
 
     async def _on_user_speech_start(self, timestamp: float) -> dict | None:
         """Handle user starting to speak, with interruption detection."""
-        self._state.last_voice_activity = timestamp
-        self._reset_silence_timer()
+        self._reset_silence_timer(timestamp)
 
         if self._state.tts_active:
             time_into_tts = (timestamp - self._state.last_tts_start) * 1000
@@ -269,6 +392,8 @@ class VapiVoiceClient:
                     retry_count=self._state.retry_count,
                 )
                 self._state.interruption_history.append(interruption)
+                self._state.interruption_count += 1
+                self._state.total_retry_count += interruption.retry_count
 
                 return {"action": "stop_speaking"}
 
@@ -288,11 +413,12 @@ class VapiVoiceClient:
 
     async def _handle_transcript(self, message: dict) -> dict | None:
         """Process transcription with interruption-aware retry logic."""
-        transcript = message.get("transcript", "")
-        role = message.get("role", "")
-        is_final = message.get("transcriptType", "") == "final"
+        # Cheapest checks first: most transcript events are interim partials.
+        if message.get("transcriptType") != "final" or message.get("role") != "user":
+            return None
 
-        if role != "user" or not is_final or not transcript.strip():
+        transcript = message.get("transcript", "")
+        if not transcript or transcript.isspace():
             return None
 
         self._state.turn_count += 1
@@ -309,7 +435,7 @@ class VapiVoiceClient:
             self._pause_silence_timer()
 
             try:
-                response = await self._on_response_callback(transcript)
+                response = await self._invoke_response_callback(transcript)
                 self._state.pending_response = response
                 self._state.retry_count = 0
                 return {"response": response}
@@ -358,14 +484,14 @@ class VapiVoiceClient:
             self._pause_silence_timer()
 
             interruption_context = (
-                f"[The patient interrupted the previous response to say: "
+                f"{INTERRUPTION_MARKER} the previous response to say: "
                 f'"{transcript}"]\n'
                 f"Please address their concern directly and concisely."
             )
 
             try:
                 await asyncio.sleep(self._retry_delay_ms / 1000)
-                response = await self._on_response_callback(interruption_context)
+                response = await self._invoke_response_callback(interruption_context)
                 self._state.pending_response = response
                 return {"response": response}
             except Exception as e:
@@ -376,20 +502,20 @@ class VapiVoiceClient:
 
         return None
 
-    async def _handle_hang(self, message: dict) -> dict | None:
+    def _handle_hang(self, message: dict) -> dict | None:
         """Handle call hang events."""
         self._state.speech_state = SpeechState.DISCONNECTED
-        self._cancel_silence_timer()
+        self._stop_silence_monitor()
 
         logger.info(
             "call_ended",
             conversation_id=self._state.conversation_id,
             turn_count=self._state.turn_count,
-            interruptions=len(self._state.interruption_history),
+            interruptions=self._state.interruption_count,
         )
         return None
 
-    async def _handle_end_of_call(self, message: dict) -> dict | None:
+    def _handle_end_of_call(self, message: dict) -> dict | None:
         """Process end-of-call analytics."""
         summary = message.get("summary", "")
         duration = message.get("durationSeconds", 0)
@@ -400,14 +526,12 @@ class VapiVoiceClient:
             duration_seconds=duration,
             summary_preview=summary[:200] if summary else "none",
             total_turns=self._state.turn_count,
-            total_interruptions=len(self._state.interruption_history),
-            total_retries=sum(
-                e.retry_count for e in self._state.interruption_history
-            ),
+            total_interruptions=self._state.interruption_count,
+            total_retries=self._state.total_retry_count,
         )
         return None
 
-    async def _handle_function_call(self, message: dict) -> dict | None:
+    def _handle_function_call(self, message: dict) -> dict | None:
         """Handle server-side function calls from Vapi."""
         function_name = message.get("functionCall", {}).get("name", "")
         parameters = message.get("functionCall", {}).get("parameters", {})
@@ -420,99 +544,129 @@ class VapiVoiceClient:
 
         return {"result": f"Function {function_name} acknowledged"}
 
-    async def _handle_status_update(self, message: dict) -> dict | None:
+    def _handle_status_update(self, message: dict) -> dict | None:
         """Handle call status updates."""
         status = message.get("status", "")
         logger.info("call_status_update", status=status)
         return None
 
     def _start_silence_timer(self) -> None:
-        self._cancel_silence_timer()
-        self._silence_monitor_task = asyncio.create_task(
-            self._monitor_silence()
-        )
+        self._silence_armed = True
+        if self._silence_monitor_task is None or self._silence_monitor_task.done():
+            self._silence_monitor_task = asyncio.create_task(
+                self._monitor_silence()
+            )
+        self._silence_wake.set()
 
-    def _reset_silence_timer(self) -> None:
-        self._state.last_voice_activity = time.time()
+    def _reset_silence_timer(self, now: float) -> None:
+        self._state.last_voice_activity = now
+        self._silence_wake.set()
 
     def _pause_silence_timer(self) -> None:
         self._cancel_silence_timer()
         self._state.silence_phase = SilencePhase.SYSTEM_PROCESSING
 
-    def _resume_silence_timer(self) -> None:
-        self._state.last_voice_activity = time.time()
+    def _resume_silence_timer(self, now: float) -> None:
+        self._state.last_voice_activity = now
         if self._state.turn_count > 0:
             self._state.silence_phase = SilencePhase.MID_CONVERSATION
         self._start_silence_timer()
 
     def _cancel_silence_timer(self) -> None:
+        self._silence_armed = False
+        self._silence_wake.set()
+
+    def _stop_silence_monitor(self) -> None:
+        self._silence_armed = False
         if self._silence_monitor_task and not self._silence_monitor_task.done():
             self._silence_monitor_task.cancel()
 
     async def _monitor_silence(self) -> None:
         """
         Per-phase silence monitoring with warning before disconnect.
+
+        Sleeps until the current silence deadline rather than polling, and
+        wakes early when voice activity moves the deadline or the timer is
+        started, paused or cancelled. Runs until the call disconnects or the
+        client is closed.
         """
         try:
             while True:
-                await asyncio.sleep(0.5)
+                self._silence_wake.clear()
 
-                if self._state.speech_state in (
-                    SpeechState.SPEAKING,
-                    SpeechState.PROCESSING,
-                    SpeechState.DISCONNECTED,
+                if not self._silence_armed or (
+                    (1 << self._state.speech_state) & _SILENCE_PAUSED_MASK
                 ):
+                    await self._silence_wake.wait()
                     continue
 
-                elapsed_ms = (time.time() - self._state.last_voice_activity) * 1000
                 timeout = self._get_current_timeout()
+                deadline_ms = timeout
+                if self._state.speech_state == SpeechState.WARNING:
+                    deadline_ms += self._warning_grace_ms
+
+                elapsed_ms = (time.monotonic() - self._state.last_voice_activity) * 1000
+                if elapsed_ms <= deadline_ms:
+                    await self._wait_for_wake((deadline_ms - elapsed_ms) / 1000)
+                    continue
 
-                if elapsed_ms > timeout:
-                    if self._state.speech_state != SpeechState.WARNING:
-                        self._state.speech_state = SpeechState.WARNING
-                        logger.info(
-                            "silence_warning_sent",
-                            elapsed_ms=round(elapsed_ms),
-                            timeout_ms=timeout,
+                if self._state.speech_state != SpeechState.WARNING:
+                    self._state.speech_state = SpeechState.WARNING
+                    logger.info(
+                        "silence_warning_sent",
+                        elapsed_ms=round(elapsed_ms),
+                        timeout_ms=timeout,
+                    )
+                    if self._on_response_callback:
+                        await self._invoke_response_callback(
+                            f"{SILENCE_CHECKIN_MARKER}. Send a gentle check-in.]"
                         )
-                        if self._on_response_callback:
-                            await self._on_response_callback(
-                                "[SYSTEM: User has been silent. Send a gentle check-in.]"
-                            )
-                        await asyncio.sleep(5.0)
-
-                    elif self._state.speech_state == SpeechState.WARNING:
-                        extra_elapsed = (
-                            time.time() - self._state.last_voice_activity
-                        ) * 1000
-                        if extra_elapsed > timeout + 5000:
-                            logger.info(
-                                "silence_disconnect",
-                                total_silence_ms=round(extra_elapsed),
-                            )
-                            self._state.speech_state = SpeechState.DISCONNECTED
-                            break
+                    # Give the patient the full grace period after the check-in,
+                    # and leave the warning as soon as they make any sound.
+                    warned_at = self._state.last_voice_activity
+                    await self._wait_for_wake(self._warning_grace_ms / 1000)
+                    if (
+                        self._state.speech_state == SpeechState.WARNING
+                        and self._state.last_voice_activity != warned_at
+                    ):
+                        self._state.speech_state = SpeechState.LISTENING
+                else:
+                    logger.info(
+                        "silence_disconnect",
+                        total_silence_ms=round(elapsed_ms),
+                    )
+                    self._state.speech_state = SpeechState.DISCONNECTED
+                    break
 
         except asyncio.CancelledError:
             pass
 
+    async def _wait_for_wake(self, timeout_s: float) -> None:
+        # asyncio.timeout rather than wait_for: wait_for can swallow a
+        # cancel() that lands while the wake event is firing, leaving the
+        # monitor running after close().
+        try:
+            async with asyncio.timeout(timeout_s):
+                await self._silence_wake.wait()
+        except TimeoutError:
+            pass
+
     def _get_current_timeout(self) -> float:
-        if self._state.silence_phase == SilencePhase.INITIAL:
-            return self._initial_silence_timeout_ms
-        return self._silence_timeout_ms
+        return self._silence_timeouts_ms[self._state.silence_phase]
 
     def get_conversation_state(self) -> dict:
         return {
-            "speech_state": self._state.speech_state.value,
-            "silence_phase": self._state.silence_phase.value,
+            "speech_state": _SPEECH_STATE_NAMES[self._state.speech_state],
+            "silence_phase": _SILENCE_PHASE_NAMES[self._state.silence_phase],
             "turn_count": self._state.turn_count,
             "retry_count": self._state.retry_count,
-            "interruption_count": len(self._state.interruption_history),
+            "interruption_count": self._state.interruption_count,
             "tts_active": self._state.tts_active,
             "conversation_id": self._state.conversation_id,
         }
 
     async def close(self) -> None:
-        self._cancel_silence_timer()
-        await self._http_client.aclose()
+        self._stop_silence_monitor()
+        # The HTTP client is the shared pool; close_vapi_http_clients()
+        # releases it at application shutdown.
         logger.info("vapi_client_closed")
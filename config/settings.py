@@ -7,6 +7,11 @@ class Settings(BaseSettings):
     openai_api_key: str = Field(..., description="OpenAI API key")
     openai_embedding_model: str = Field("text-embedding-3-small")
     openai_chat_model: str = Field("gpt-4o")
+    openai_summary_model: str = Field("gpt-4o-mini")
+    openai_embedding_batch_size: int = Field(96)
+    openai_embedding_max_concurrency: int = Field(8)
+    openai_embedding_cache_size: int = Field(10_000)
+    embedding_cache_path: str = Field("./cache/embeddings.sqlite3")
 
     vapi_api_key: str = Field(..., description="Vapi.ai API key")
     vapi_base_url: str = Field("https://api.vapi.ai")
@@ -15,12 +20,29 @@ class Settings(BaseSettings):
 
     chroma_persist_dir: str = Field("./chroma_db")
     chroma_collection_name: str = Field("clinical_content")
+    chroma_index_batch_size: int = Field(100)
 
     rag_chunk_size: int = Field(512)
     rag_chunk_overlap: int = Field(64)
     rag_top_k: int = Field(5)
-    rag_similarity_threshold: float = Field(0.78)
+    # Cosine similarity. 0.844 is the cutoff the original 0.78 threshold
+    # applied under Chroma's default l2 relevance score (1 - d / sqrt(2)).
+    rag_similarity_threshold: float = Field(0.844)
     rag_max_context_tokens: int = Field(3000)
+    rag_intent_similarity_threshold: float = Field(0.3)
+    rag_exact_search_max_rows: int = Field(5000)
+    rag_hnsw_m: int = Field(16)
+    rag_hnsw_construction_ef: int = Field(64)
+    rag_ef_search: int = Field(40)
+    rag_query_cache_size: int = Field(2000)
+    rag_query_cache_ttl_s: float = Field(300.0)
+
+    llm_semantic_cache_threshold: float = Field(0.95)
+    llm_semantic_cache_size: int = Field(256)
+    llm_semantic_cache_ttl_s: float = Field(300.0)
+    llm_history_summary_interval: int = Field(8)
+    llm_history_keep_recent: int = Field(4)
+    llm_history_max_tokens: int = Field(2000)
 
     voice_silence_timeout_ms: int = Field(2500)
     voice_interruption_threshold_ms: int = Field(300)
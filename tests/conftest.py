@@ -9,3 +9,4 @@ os.environ.setdefault("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 os.environ.setdefault("OPENAI_CHAT_MODEL", "gpt-4o")
 os.environ.setdefault("CHROMA_PERSIST_DIR", "./test_chroma_db")
 os.environ.setdefault("CHROMA_COLLECTION_NAME", "test_clinical")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
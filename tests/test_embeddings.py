@@ -0,0 +1,113 @@
+"""Tests for the embedding manager: batching, normalization, and caching."""
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.rag.embeddings import EmbeddingManager
+
+
+def _fake_vectors(texts: list[str]) -> list[list[float]]:
+    return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+
+@pytest.fixture
+def manager():
+    with patch("app.rag.embeddings.OpenAIEmbeddings") as mock_cls:
+        mock_cls.return_value.aembed_documents = AsyncMock(side_effect=_fake_vectors)
+        mock_cls.return_value.aembed_query = AsyncMock(return_value=[3.0, 4.0, 0.0])
+        m = EmbeddingManager()
+        yield m
+
+
+class TestEmbedDocuments:
+    @pytest.mark.asyncio
+    async def test_splits_into_batches(self, manager):
+        manager._batch_size = 4
+        texts = [f"chunk {i}" for i in range(10)]
+
+        results = await manager.embed_documents(texts)
+
+        assert results.shape == (10, 3)
+        assert results.dtype == np.float32
+        assert manager._embeddings.aembed_documents.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_preserves_input_order(self, manager):
+        manager._batch_size = 2
+        texts = ["a", "bbbb", "cc", "ddd", "e"]
+
+        results = await manager.embed_documents(texts)
+        expected = await manager.embed_documents(list(texts))
+
+        assert np.array_equal(results, expected)
+        assert not np.array_equal(results[0], results[1])
+
+    @pytest.mark.asyncio
+    async def test_cached_texts_not_reembedded(self, manager):
+        await manager.embed_documents(["alpha", "beta"])
+        await manager.embed_documents(["alpha", "beta", "gamma"])
+
+        calls = manager._embeddings.aembed_documents.await_args_list
+        assert calls[-1].args[0] == ["gamma"]
+
+    @pytest.mark.asyncio
+    async def test_rows_are_unit_norm(self, manager):
+        results = await manager.embed_documents(["short", "a much longer chunk"])
+        norms = np.linalg.norm(results, axis=1)
+        assert norms == pytest.approx([1.0, 1.0], abs=1e-6)
+
+
+class TestEmbeddingCache:
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, manager):
+        manager._cache_size = 2
+        await manager.embed_documents(["alpha", "beta"])
+        await manager.embed_documents(["alpha"])
+        await manager.embed_documents(["gamma"])
+
+        assert len(manager._embedding_cache) == 2
+        assert manager._cache_key("alpha") in manager._embedding_cache
+        assert manager._cache_key("beta") not in manager._embedding_cache
+
+    @pytest.mark.asyncio
+    async def test_disk_cache_survives_restart(self, manager, tmp_path):
+        cache_path = str(tmp_path / "embeddings.sqlite3")
+        manager._disk_cache = manager._open_disk_cache(cache_path)
+        first = await manager.embed_documents(["alpha", "beta"])
+
+        restarted = EmbeddingManager()
+        restarted._disk_cache = restarted._open_disk_cache(cache_path)
+        restarted._embeddings.aembed_documents.reset_mock()
+        second = await restarted.embed_documents(["alpha", "beta"])
+
+        assert np.array_equal(first, second)
+        restarted._embeddings.aembed_documents.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_disk_cache_is_per_model(self, manager, tmp_path):
+        cache_path = str(tmp_path / "embeddings.sqlite3")
+        manager._disk_cache = manager._open_disk_cache(cache_path)
+        await manager.embed_documents(["alpha"])
+
+        other = EmbeddingManager(model_name="text-embedding-3-large")
+        other._disk_cache = other._open_disk_cache(cache_path)
+        other._embeddings.aembed_documents.reset_mock()
+        await other.embed_documents(["alpha"])
+
+        other._embeddings.aembed_documents.assert_awaited_once()
+
+
+class TestEmbedText:
+    @pytest.mark.asyncio
+    async def test_returns_unit_vector(self, manager):
+        vector = await manager.embed_text("How is my blood pressure?")
+        assert vector[0] == pytest.approx(0.6)
+        assert vector[1] == pytest.approx(0.8)
+
+    @pytest.mark.asyncio
+    async def test_queries_not_written_to_disk(self, manager, tmp_path):
+        manager._disk_cache = manager._open_disk_cache(str(tmp_path / "embeddings.sqlite3"))
+        await manager.embed_text("How is my blood pressure?")
+
+        rows = manager._disk_cache.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        assert rows[0] == 0
@@ -0,0 +1,203 @@
+"""Tests for the LLM chain: semantic response caching, message layout, and streaming."""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from app.llm_chain import ClinicalLLMChain
+from app.rag.vector_store import RetrievalResult
+from app.templates.prompts import CLINICAL_SYSTEM_PROMPT
+from app.validation.response_filter import SAFE_FALLBACK_RESPONSE
+
+VALID_RESPONSE = (
+    "Thank you for checking in about your medication routine today. "
+    "Please keep taking it as prescribed and contact your provider if you "
+    "notice any side effects or have questions before your next follow up visit."
+)
+
+
+def _astream_of(*pieces: str):
+    async def astream(messages):
+        for piece in pieces:
+            yield AIMessageChunk(content=piece)
+
+    return astream
+
+
+def _rewind_history(chain: ClinicalLLMChain) -> None:
+    """Return to an empty history without starting a new conversation."""
+    chain._conversation_history.clear()
+
+
+@pytest.fixture
+def chain():
+    retriever = MagicMock()
+    retriever.embedding_manager.embed_text = AsyncMock(return_value=[1.0, 0.0, 0.0])
+    retriever.retrieve_with_intent = AsyncMock(return_value=(None, []))
+    retriever.assemble_context.return_value = "clinical context"
+
+    c = ClinicalLLMChain(retriever)
+    c._llm = MagicMock()
+    c._llm.ainvoke = AsyncMock(return_value=AIMessage(content=VALID_RESPONSE))
+    return c
+
+
+class TestSemanticCache:
+    @pytest.mark.asyncio
+    async def test_duplicate_query_skips_llm(self, chain):
+        first = await chain.generate_response("How do I take my medication?")
+        _rewind_history(chain)
+        second = await chain.generate_response("How do I take my medication?")
+
+        assert first == second
+        assert chain._llm.ainvoke.await_count == 1
+        assert chain._retriever.retrieve_with_intent.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_new_conversation_misses_cache(self, chain):
+        await chain.generate_response("How do I take my medication?")
+        chain.clear_history()
+        await chain.generate_response("How do I take my medication?")
+
+        assert chain._llm.ainvoke.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_different_history_misses_cache(self, chain):
+        await chain.generate_response("How do I take my medication?")
+        await chain.generate_response("How do I take my medication?")
+
+        assert chain._llm.ainvoke.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_dissimilar_query_misses_cache(self, chain):
+        await chain.generate_response("How do I take my medication?")
+        _rewind_history(chain)
+        chain._retriever.embedding_manager.embed_text.return_value = [0.0, 1.0, 0.0]
+        await chain.generate_response("When is my appointment?")
+
+        assert chain._llm.ainvoke.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_silence_checkin_bypasses_cache(self, chain):
+        chain._llm.ainvoke.return_value = AIMessage(content="Are you still there?")
+        await chain.generate_response("[SYSTEM: User has been silent. Send a gentle check-in.]")
+
+        chain._retriever.embedding_manager.embed_text.assert_not_awaited()
+        assert not chain._semantic_cache
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_misses_cache(self, chain):
+        chain._semantic_cache_ttl = -1.0
+        await chain.generate_response("How do I take my medication?")
+        _rewind_history(chain)
+        await chain.generate_response("How do I take my medication?")
+
+        assert chain._llm.ainvoke.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cleared_cache_misses(self, chain):
+        await chain.generate_response("How do I take my medication?")
+        _rewind_history(chain)
+        chain.clear_semantic_cache()
+        await chain.generate_response("How do I take my medication?")
+
+        assert chain._llm.ainvoke.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_returns_original_sources(self, chain):
+        sources = [
+            RetrievalResult(text="Take as prescribed.", score=0.9, metadata={}, token_estimate=4)
+        ]
+        chain._retriever.retrieve_with_intent.return_value = ("medication_management", sources)
+
+        await chain.generate_response_with_sources("How do I take my medication?")
+        _rewind_history(chain)
+        response, results, category = await chain.generate_response_with_sources(
+            "How do I take my medication?"
+        )
+
+        assert results == sources
+        assert category == "medication_management"
+        assert chain._retriever.retrieve_with_intent.await_count == 1
+
+
+class TestMessageLayout:
+    @pytest.mark.asyncio
+    async def test_static_prefix_then_history_then_context(self, chain):
+        await chain.generate_response("How do I take my medication?")
+        await chain.generate_response("What about side effects?")
+
+        messages = chain._llm.ainvoke.await_args.args[0]
+        assert messages[0] == SystemMessage(content=CLINICAL_SYSTEM_PROMPT)
+        assert messages[1].content == "How do I take my medication?"
+        assert isinstance(messages[-2], SystemMessage)
+        assert "clinical context" in messages[-2].content
+        assert isinstance(messages[-1], HumanMessage)
+
+
+class TestStreaming:
+    @pytest.mark.asyncio
+    async def test_yields_complete_sentences(self, chain):
+        chain._llm.astream = _astream_of("Thanks for ", "calling. Please contact ", "your provider.")
+
+        sentences = [s async for s in chain.stream_response("Any advice?")]
+
+        assert sentences == ["Thanks for calling.", "Please contact your provider."]
+        assert chain._conversation_history[-1]["content"] == (
+            "Thanks for calling. Please contact your provider."
+        )
+
+    @pytest.mark.asyncio
+    async def test_unsafe_sentence_replaced_with_fallback(self, chain):
+        chain._llm.astream = _astream_of("Hello there. ", "Take 500 mg daily. ", "Bye now.")
+
+        sentences = [s async for s in chain.stream_response("How much should I take?")]
+
+        assert sentences == ["Hello there.", SAFE_FALLBACK_RESPONSE]
+
+    @pytest.mark.asyncio
+    async def test_system_artifacts_stripped_from_sentences(self, chain):
+        chain._llm.astream = _astream_of(
+            "Assistant: Thanks for calling. ",
+            "[INTERNAL] patient flagged high risk. ",
+            "Please contact your provider.",
+        )
+
+        sentences = [s async for s in chain.stream_response("Any advice?")]
+
+        assert sentences == ["Thanks for calling.", "Please contact your provider."]
+        assert "INTERNAL" not in chain._conversation_history[-1]["content"]
+
+
+class TestHistorySummary:
+    @pytest.mark.asyncio
+    async def test_old_turns_replaced_by_summary(self, chain):
+        chain._summary_interval = 3
+        chain._summary_llm = MagicMock()
+        chain._summary_llm.ainvoke = AsyncMock(
+            return_value=AIMessage(content="Patient takes metformin daily.")
+        )
+
+        for i in range(3):
+            await chain.generate_response(f"Question {i}?")
+        await chain._summary_task
+
+        history = chain._conversation_history
+        assert len(history) == 1 + chain._history_keep_recent
+        assert history[0]["role"] == "system"
+        assert "metformin" in history[0]["content"]
+
+        await chain.generate_response("Anything else?")
+        messages = chain._llm.ainvoke.await_args.args[0]
+        assert isinstance(messages[1], SystemMessage)
+        assert "metformin" in messages[1].content
+
+    def test_window_respects_token_cap(self, chain):
+        chain._history_max_tokens = 50
+        chain._conversation_history = [
+            {"role": "user", "content": "x" * 160},
+            {"role": "assistant", "content": "y" * 160},
+        ]
+
+        window = chain._history_window()
+
+        assert [entry["role"] for entry in window] == ["assistant"]
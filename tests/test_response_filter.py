@@ -0,0 +1,69 @@
+"""Tests for the response filter's correction pipeline."""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from app.validation.response_filter import ClinicalResponseFilter, SAFE_FALLBACK_RESPONSE
+
+VALID_RESPONSE = (
+    "Thank you for checking in about your medication routine today. "
+    "Please keep taking it as prescribed and contact your provider if you "
+    "notice any side effects or have questions before your next follow up visit."
+)
+
+
+@pytest.fixture
+def response_filter():
+    return ClinicalResponseFilter()
+
+
+class TestSpeculativeCorrection:
+    @pytest.mark.asyncio
+    async def test_first_valid_candidate_wins(self, response_filter):
+        async def correct(response, result, sections, temperature=0.1):
+            if temperature == 0.1:
+                await asyncio.sleep(0.05)
+                return "Still too short."
+            return VALID_RESPONSE
+
+        response_filter._attempt_correction = AsyncMock(side_effect=correct)
+
+        output, result = await response_filter.filter_response("Take 500 mg now.")
+
+        assert result.is_valid
+        assert output == VALID_RESPONSE
+        assert response_filter._attempt_correction.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_falls_back_after_all_rounds_fail(self, response_filter):
+        response_filter._attempt_correction = AsyncMock(return_value="Too short.")
+
+        output, _ = await response_filter.filter_response("Take 500 mg now.")
+
+        assert output == SAFE_FALLBACK_RESPONSE
+        # Two candidates in the first round, one in the second.
+        assert response_filter._attempt_correction.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_candidate_does_not_abort_race(self, response_filter):
+        async def correct(response, result, sections, temperature=0.1):
+            if temperature == 0.1:
+                raise TimeoutError("correction timed out")
+            await asyncio.sleep(0.01)
+            return VALID_RESPONSE
+
+        response_filter._attempt_correction = AsyncMock(side_effect=correct)
+
+        output, result = await response_filter.filter_response("Take 500 mg now.")
+
+        assert result.is_valid
+        assert output == VALID_RESPONSE
+
+    @pytest.mark.asyncio
+    async def test_raises_when_every_candidate_fails(self, response_filter):
+        response_filter._attempt_correction = AsyncMock(
+            side_effect=TimeoutError("correction timed out")
+        )
+
+        with pytest.raises(TimeoutError):
+            await response_filter.filter_response("Take 500 mg now.")
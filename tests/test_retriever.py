@@ -1,5 +1,6 @@
 """Tests for RAG retriever: intent classification and context assembly."""
 
+import numpy as np
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from app.rag.retriever import ClinicalRAGRetriever
@@ -56,6 +57,19 @@ class TestIntentClassification:
         )
         assert category == "medication_management"
 
+    def test_keyword_match_is_case_insensitive(self, retriever):
+        category, tags = retriever.classify_intent("My A1C came back high")
+        assert category == "chronic_care"
+
+    @pytest.mark.parametrize("query", [
+        "I need to reschedule my medication pickup",
+        "Can I reschedule the refill",
+    ])
+    def test_nested_keywords_both_count(self, retriever, query):
+        # "reschedule" also contains "schedule"; both must score.
+        category, tags = retriever.classify_intent(query)
+        assert category == "scheduling"
+
 
 class TestContextAssembly:
     def test_empty_results(self, retriever):
@@ -103,3 +117,68 @@ class TestContextAssembly:
         context = retriever.assemble_context(results)
         assert "Test Title" in context
         assert "intro" in context
+
+
+class TestRetrieve:
+    @pytest.mark.asyncio
+    async def test_intent_hints_applied_when_ranking(self, retriever):
+        retriever._vector_store.search = AsyncMock(return_value=[])
+        retriever._vector_store.rank.return_value = []
+
+        await retriever.retrieve("Is the patient taking their medication?")
+
+        retriever._vector_store.search.assert_awaited_once()
+        kwargs = retriever._vector_store.rank.call_args.kwargs
+        assert kwargs["category_hint"] == "medication_management"
+        assert "medication" in kwargs["tag_hints"]
+
+    @pytest.mark.asyncio
+    async def test_embedding_uses_centroid_classifier(self, retriever):
+        retriever._category_centroids = np.eye(5, 3, dtype=np.float32)
+        retriever._vector_store.search = AsyncMock(return_value=[])
+        retriever._vector_store.rank.return_value = []
+
+        query_vec = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+        category, _ = await retriever.retrieve_with_intent("I ran out of pills", query_vec)
+
+        kwargs = retriever._vector_store.rank.call_args.kwargs
+        assert kwargs["category_hint"] == "scheduling"
+        assert category == "scheduling"
+
+
+class TestEmbeddingIntentClassification:
+    def test_below_threshold_returns_none(self, retriever):
+        retriever._category_centroids = np.eye(5, 3, dtype=np.float32)
+        query_vec = np.array([0.0, 0.0, 0.0], dtype=np.float32)
+        assert retriever.classify_intent_by_embedding(query_vec) == (None, [])
+
+    @pytest.mark.asyncio
+    async def test_centroids_are_unit_norm(self, retriever):
+        def fake_embed(texts):
+            return np.random.default_rng(0).normal(size=(len(texts), 8)).astype(np.float32)
+
+        retriever._embedding_manager.embed_documents = AsyncMock(side_effect=fake_embed)
+        await retriever.build_intent_centroids()
+
+        norms = np.linalg.norm(retriever._category_centroids, axis=1)
+        assert retriever._category_centroids.shape == (5, 8)
+        assert norms == pytest.approx(np.ones(5), abs=1e-5)
+
+
+class TestLoadClinicalContent:
+    @pytest.mark.asyncio
+    async def test_chunks_templates_and_knowledge(self, retriever):
+        retriever._vector_store.index_chunks = AsyncMock(side_effect=lambda chunks: len(chunks))
+
+        count = await retriever.load_clinical_content()
+
+        chunks = retriever._vector_store.index_chunks.await_args.args[0]
+        categories = {c.metadata["category"] for c in chunks}
+        assert count == len(chunks)
+        assert "medication_management" in categories
+        assert "scheduling" in categories
+
+    @pytest.mark.asyncio
+    async def test_missing_file_raises(self, retriever):
+        with pytest.raises(FileNotFoundError):
+            await retriever.load_clinical_content("does/not/exist.yaml")
@@ -64,6 +64,24 @@ class TestDisallowedContent:
         codes = [i.code for i in result.issues]
         assert "absolute_promise" in codes
 
+    def test_rejects_guaranteed_outcome(self, validator):
+        issues = validator.find_disallowed_content("Your recovery is guaranteed.")
+        assert [i.code for i in issues] == ["absolute_promise"]
+
+    def test_reports_overlapping_matches(self, validator):
+        bad_output = (
+            "I diagnose this as low iron, take 500 mg daily, so you have anemia. "
+            "Please call your doctor for a follow up visit soon."
+        )
+        result = validator.validate(bad_output)
+        codes = [i.code for i in result.issues]
+        assert codes[:2] == ["specific_dosage", "unsolicited_diagnosis"]
+        assert "Found: '500 mg'" in result.issues[0].message
+
+    def test_keyword_prefilter_handles_case_folding(self, validator):
+        issues = validator.find_disallowed_content("Please ſtop taking it today.")
+        assert [i.code for i in issues] == ["stop_medication_advice"]
+
 
 class TestSectionStructure:
     def test_valid_sections_score_high(self, validator):
@@ -143,3 +161,11 @@ class TestOverallValidation:
             template_id="test",
         )
         assert result.is_valid is False
+
+    def test_repeated_validation_reuses_result(self, validator):
+        first = validator.validate("Hello there.")
+        first.issues.clear()
+        second = validator.validate("Hello there.")
+
+        assert [i.code for i in second.issues] == ["too_short", "missing_safety_language"]
+        assert len(validator._result_cache) == 1
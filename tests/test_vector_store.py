@@ -0,0 +1,189 @@
+"""Tests for the clinical vector store: exact matrix search and re-ranking."""
+
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+from langchain_core.documents import Document
+from app.rag.chunking import ClinicalChunk
+from app.rag.embeddings import EmbeddingManager
+from app.rag.vector_store import ClinicalVectorStore
+
+COLLECTION = {
+    "ids": ["med_0", "sched_1", "bp_2"],
+    "documents": [
+        "Take your medication as prescribed.",
+        "Your appointment is on Monday.",
+        "Check your blood pressure daily.",
+    ],
+    "metadatas": [
+        {"source_id": "med", "category": "medication_management", "tags": ["medication"]},
+        {"source_id": "sched", "category": "scheduling", "tags": ["appointment"]},
+        {"source_id": "bp", "category": "chronic_care", "tags": ["blood pressure"]},
+    ],
+    "embeddings": [
+        [1.0, 0.0, 0.0],
+        [0.0, 2.0, 0.0],
+        [0.6, 0.0, 0.8],
+    ],
+}
+
+
+@pytest.fixture
+def store():
+    with patch("app.rag.embeddings.OpenAIEmbeddings"), \
+         patch("app.rag.vector_store.Chroma") as mock_chroma:
+        mock_chroma.return_value._collection.get.return_value = COLLECTION
+        mock_chroma.return_value._collection.count.return_value = len(COLLECTION["ids"])
+        manager = EmbeddingManager()
+        manager.embed_text = AsyncMock(return_value=np.array([1.0, 0.0, 0.0], dtype=np.float32))
+        yield ClinicalVectorStore(manager)
+
+
+class TestMatrixSearch:
+    @pytest.mark.asyncio
+    async def test_results_ordered_by_cosine(self, store):
+        results = await store.search("medication", top_k=1)
+
+        texts = [doc.page_content for doc, _ in results]
+        scores = [score for _, score in results]
+        assert texts[0] == "Take your medication as prescribed."
+        assert scores == sorted(scores, reverse=True)
+        assert scores[0] == pytest.approx(1.0)
+        assert scores[1] == pytest.approx(0.6)
+
+    @pytest.mark.asyncio
+    async def test_uses_supplied_embedding(self, store):
+        query_vec = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+        results = await store.search("anything", query_embedding=query_vec)
+
+        assert results[0][0].metadata["category"] == "scheduling"
+        store._embedding_manager.embed_text.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_empty_collection_returns_nothing(self, store):
+        store._store._collection.get.return_value = {
+            "ids": [], "documents": [], "metadatas": [], "embeddings": [],
+        }
+        store._store._collection.count.return_value = 0
+        assert await store.search("medication") == []
+
+    @pytest.mark.asyncio
+    async def test_large_collection_uses_ann_index(self, store):
+        store._exact_search_max_rows = 2
+        store._store._collection.metadata = {"hnsw:space": "cosine"}
+        store._store.similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(page_content="Take your medication as prescribed."), 0.1),
+        ]
+
+        results = await store.search("medication")
+
+        assert results[0][1] == pytest.approx(0.9)
+        assert store._matrix is None
+        store._store._collection.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_ann_scores_are_cosine_for_l2_collection(self, store):
+        # A collection persisted before the cosine space was set uses l2,
+        # whose squared distance for unit vectors is 2 - 2cos.
+        store._exact_search_max_rows = 2
+        store._store._collection.metadata = None
+        store._store.similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(page_content="Take your medication as prescribed."), 0.8),
+        ]
+
+        results = await store.search("medication")
+
+        assert results[0][1] == pytest.approx(0.6)
+
+
+class TestIndexChunks:
+    @pytest.mark.asyncio
+    async def test_upserts_precomputed_embeddings_in_batches(self, store):
+        store._index_batch_size = 2
+        chunks = [
+            ClinicalChunk(text=f"chunk {i}", metadata={"source_id": "med"})
+            for i in range(5)
+        ]
+        vectors = np.eye(5, 3, dtype=np.float32)
+        store._embedding_manager.embed_documents = AsyncMock(return_value=vectors)
+
+        assert await store.index_chunks(chunks) == 5
+
+        store._embedding_manager.embed_documents.assert_awaited_once_with(
+            [chunk.text for chunk in chunks]
+        )
+        calls = store._store._collection.upsert.call_args_list
+        assert [len(c.kwargs["ids"]) for c in calls] == [2, 2, 1]
+        assert calls[-1].kwargs["ids"] == ["med_4"]
+        assert np.array_equal(calls[-1].kwargs["embeddings"], vectors[4:])
+
+
+class TestQueryCache:
+    @pytest.mark.asyncio
+    async def test_repeated_query_skips_embedding(self, store):
+        first = await store.search("Medication ")
+        second = await store.search("medication")
+
+        assert second == first
+        store._embedding_manager.embed_text.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_queries_share_one_search(self, store):
+        results = await asyncio.gather(
+            store.search("medication"), store.search("Medication")
+        )
+
+        assert results[0] == results[1]
+        store._embedding_manager.embed_text.assert_awaited_once()
+        assert store._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_recomputed(self, store):
+        store._query_cache_ttl = -1.0
+        await store.search("medication")
+        await store.search("medication")
+
+        assert store._embedding_manager.embed_text.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_clear_invalidates_cache(self, store):
+        await store.search("medication")
+        await store.clear()
+
+        assert await store.search("medication") == []
+
+
+class TestRank:
+    def test_threshold_and_category_boost(self, store):
+        raw = [
+            (Document(page_content=text, metadata=meta), score)
+            for text, meta, score in zip(
+                COLLECTION["documents"], COLLECTION["metadatas"], [0.87, 0.86, 0.50]
+            )
+        ]
+
+        results = store.rank(raw, "When is my appointment?", category_hint="scheduling")
+
+        assert [r.metadata["source_id"] for r in results] == ["sched", "med"]
+        assert results[0].score == pytest.approx(0.91)
+
+    def test_duplicate_chunks_dropped(self, store):
+        doc = Document(page_content="Take your medication as prescribed.", metadata={})
+        raw = [(doc, 0.95), (Document(page_content=doc.page_content), 0.94)]
+
+        results = store.rank(raw, "medication")
+
+        assert len(results) == 1
+        assert results[0].score == pytest.approx(0.95)
+
+    def test_chunks_sharing_a_prefix_are_kept(self, store):
+        prefix = "Medication Adherence Guidelines. " * 10
+        raw = [
+            (Document(page_content=prefix + "Take it with food.", metadata={}), 0.95),
+            (Document(page_content=prefix + "Do not double a missed dose.", metadata={}), 0.94),
+        ]
+
+        results = store.rank(raw, "medication")
+
+        assert len(results) == 2
@@ -1,39 +1,73 @@
 """Tests for voice agent state machine: interruptions, silence, and retry logic."""
 
+import asyncio
 import time
+import orjson
+from types import SimpleNamespace
 import pytest
 import pytest_asyncio
 from unittest.mock import AsyncMock, patch, MagicMock
 from app.voice.vapi_client import (
     VapiVoiceClient,
+    close_vapi_http_clients,
     SpeechState,
     SilencePhase,
     ConversationState,
 )
 
 
+def _test_settings() -> SimpleNamespace:
+    return SimpleNamespace(
+        vapi_api_key="test-key",
+        vapi_base_url="https://api.vapi.ai",
+        vapi_assistant_id="test-assistant",
+        vapi_phone_number_id="test-phone",
+        openai_chat_model="gpt-4o",
+        voice_silence_timeout_ms=2500,
+        voice_interruption_threshold_ms=300,
+        voice_max_retries=3,
+        voice_retry_delay_ms=100,
+    )
+
+
 @pytest.fixture
 def mock_settings():
-    with patch("app.voice.vapi_client.get_settings") as mock:
-        settings = MagicMock()
-        settings.vapi_api_key = "test-key"
-        settings.vapi_base_url = "https://api.vapi.ai"
-        settings.vapi_assistant_id = "test-assistant"
-        settings.vapi_phone_number_id = "test-phone"
-        settings.voice_silence_timeout_ms = 2500
-        settings.voice_interruption_threshold_ms = 300
-        settings.voice_max_retries = 3
-        settings.voice_retry_delay_ms = 100
-        mock.return_value = settings
+    settings = _test_settings()
+    with patch("app.voice.vapi_client.get_settings", return_value=settings):
         yield settings
 
 
+async def _static_response(text: str) -> str:
+    return "Response here."
+
+
+def _set_silence_timeout(client: VapiVoiceClient, timeout_ms: int) -> None:
+    """Override the mid-call silence timeout, keeping the initial-phase one."""
+    client._silence_timeouts_ms = tuple(
+        client._initial_silence_timeout_ms if phase is SilencePhase.INITIAL else timeout_ms
+        for phase in SilencePhase
+    )
+
+
 @pytest.fixture
 def voice_client(mock_settings):
     client = VapiVoiceClient()
     return client
 
 
+@pytest.fixture(scope="module")
+def voice_client_shared():
+    with patch("app.voice.vapi_client.get_settings", return_value=_test_settings()):
+        return VapiVoiceClient()
+
+
+@pytest.fixture
+def idle_client(voice_client_shared):
+    """Shared client with fresh state, for synchronous tests that start no tasks."""
+    voice_client_shared._state = ConversationState()
+    return voice_client_shared
+
+
 class TestSpeechStateTransitions:
     @pytest.mark.asyncio
     async def test_user_speech_start_sets_listening(self, voice_client):
@@ -81,7 +115,7 @@ class TestInterruptionDetection:
     @pytest.mark.asyncio
     async def test_interruption_during_tts_detected(self, voice_client):
         voice_client._state.tts_active = True
-        voice_client._state.last_tts_start = time.time() - 1.0
+        voice_client._state.last_tts_start = time.monotonic() - 1.0
         voice_client._state.speech_state = SpeechState.SPEAKING
 
         event = {
@@ -116,8 +150,7 @@ class TestInterruptionDetection:
 class TestRetryLogic:
     @pytest.mark.asyncio
     async def test_retry_after_interruption(self, voice_client):
-        callback = AsyncMock(return_value="Here's your answer.")
-        voice_client.set_response_callback(callback)
+        voice_client.set_response_callback(_static_response)
 
         voice_client._state.speech_state = SpeechState.INTERRUPTED
         voice_client._state.retry_count = 0
@@ -136,6 +169,46 @@ class TestRetryLogic:
         assert "response" in result
         assert voice_client._state.retry_count == 1
 
+    @pytest.mark.asyncio
+    async def test_streaming_callback_is_collected(self, voice_client):
+        async def streaming_callback(text):
+            yield "First sentence."
+            yield "Second sentence."
+
+        voice_client.set_response_callback(streaming_callback)
+        voice_client._state.speech_state = SpeechState.LISTENING
+
+        event = {
+            "message": {
+                "type": "transcript",
+                "transcript": "How is my blood pressure?",
+                "role": "user",
+                "transcriptType": "final",
+            }
+        }
+        result = await voice_client.handle_webhook_event(event)
+
+        assert result == {"response": "First sentence. Second sentence."}
+
+    @pytest.mark.asyncio
+    async def test_partial_transcript_ignored(self, voice_client):
+        callback = AsyncMock(return_value="Response here.")
+        voice_client.set_response_callback(callback)
+
+        event = {
+            "message": {
+                "type": "transcript",
+                "transcript": "How is my",
+                "role": "user",
+                "transcriptType": "partial",
+            }
+        }
+        result = await voice_client.handle_webhook_event(event)
+
+        assert result is None
+        assert voice_client._state.turn_count == 0
+        callback.assert_not_awaited()
+
     @pytest.mark.asyncio
     async def test_max_retries_exceeded(self, voice_client):
         voice_client._state.speech_state = SpeechState.INTERRUPTED
@@ -157,8 +230,7 @@ class TestRetryLogic:
 
     @pytest.mark.asyncio
     async def test_normal_transcript_resets_retry(self, voice_client):
-        callback = AsyncMock(return_value="Response here.")
-        voice_client.set_response_callback(callback)
+        voice_client.set_response_callback(_static_response)
         voice_client._state.speech_state = SpeechState.LISTENING
         voice_client._state.retry_count = 2
 
@@ -176,20 +248,19 @@ class TestRetryLogic:
 
 
 class TestSilencePhases:
-    def test_initial_phase_has_longer_timeout(self, voice_client):
-        voice_client._state.silence_phase = SilencePhase.INITIAL
-        timeout = voice_client._get_current_timeout()
+    def test_initial_phase_has_longer_timeout(self, idle_client):
+        idle_client._state.silence_phase = SilencePhase.INITIAL
+        timeout = idle_client._get_current_timeout()
         assert timeout == 10000
 
-    def test_mid_conversation_uses_configured_timeout(self, voice_client):
-        voice_client._state.silence_phase = SilencePhase.MID_CONVERSATION
-        timeout = voice_client._get_current_timeout()
+    def test_mid_conversation_uses_configured_timeout(self, idle_client):
+        idle_client._state.silence_phase = SilencePhase.MID_CONVERSATION
+        timeout = idle_client._get_current_timeout()
         assert timeout == 2500
 
     @pytest.mark.asyncio
     async def test_transcript_switches_to_mid_conversation(self, voice_client):
-        callback = AsyncMock(return_value="Got it.")
-        voice_client.set_response_callback(callback)
+        voice_client.set_response_callback(_static_response)
         voice_client._state.silence_phase = SilencePhase.INITIAL
 
         event = {
@@ -208,8 +279,8 @@ class TestSilencePhases:
 
 
 class TestConversationStateReporting:
-    def test_state_report_structure(self, voice_client):
-        state = voice_client.get_conversation_state()
+    def test_state_report_structure(self, idle_client):
+        state = idle_client.get_conversation_state()
         assert "speech_state" in state
         assert "silence_phase" in state
         assert "turn_count" in state
@@ -217,6 +288,15 @@ class TestConversationStateReporting:
         assert "interruption_count" in state
         assert "tts_active" in state
 
+    def test_states_reported_as_strings(self, idle_client):
+        idle_client._state.speech_state = SpeechState.DISCONNECTED
+        idle_client._state.silence_phase = SilencePhase.MID_CONVERSATION
+
+        state = idle_client.get_conversation_state()
+
+        assert state["speech_state"] == "disconnected"
+        assert state["silence_phase"] == "mid_conversation"
+
     @pytest.mark.asyncio
     async def test_call_end_updates_state(self, voice_client):
         event = {
@@ -226,3 +306,196 @@ class TestConversationStateReporting:
         }
         await voice_client.handle_webhook_event(event)
         assert voice_client._state.speech_state == SpeechState.DISCONNECTED
+
+
+class TestSilenceMonitor:
+    @pytest.mark.asyncio
+    async def test_check_in_then_disconnect_after_grace(self, voice_client):
+        callback = AsyncMock(return_value="Are you still there?")
+        voice_client.set_response_callback(callback)
+        _set_silence_timeout(voice_client, 50)
+        voice_client._warning_grace_ms = 50
+        voice_client._state.silence_phase = SilencePhase.MID_CONVERSATION
+        voice_client._state.speech_state = SpeechState.LISTENING
+        voice_client._state.last_voice_activity = time.monotonic()
+
+        voice_client._start_silence_timer()
+        await asyncio.sleep(0.08)
+        assert voice_client._state.speech_state == SpeechState.WARNING
+        callback.assert_awaited_once()
+
+        await asyncio.wait_for(voice_client._silence_monitor_task, timeout=1.0)
+        assert voice_client._state.speech_state == SpeechState.DISCONNECTED
+
+    @pytest.mark.asyncio
+    async def test_voice_activity_pushes_deadline(self, voice_client):
+        _set_silence_timeout(voice_client, 100)
+        voice_client._state.silence_phase = SilencePhase.MID_CONVERSATION
+        voice_client._state.speech_state = SpeechState.LISTENING
+        voice_client._state.last_voice_activity = time.monotonic()
+
+        voice_client._start_silence_timer()
+        await asyncio.sleep(0.07)
+        voice_client._reset_silence_timer(time.monotonic())
+        await asyncio.sleep(0.07)
+
+        assert voice_client._state.speech_state == SpeechState.LISTENING
+        voice_client._stop_silence_monitor()
+
+    @pytest.mark.asyncio
+    async def test_voice_activity_during_grace_clears_warning(self, voice_client):
+        _set_silence_timeout(voice_client, 50)
+        voice_client._warning_grace_ms = 5000
+        voice_client._state.silence_phase = SilencePhase.MID_CONVERSATION
+        voice_client._state.speech_state = SpeechState.LISTENING
+        voice_client._state.last_voice_activity = time.monotonic()
+
+        voice_client._start_silence_timer()
+        await asyncio.sleep(0.08)
+        assert voice_client._state.speech_state == SpeechState.WARNING
+
+        voice_client._reset_silence_timer(time.monotonic())
+        await asyncio.sleep(0.01)
+
+        assert voice_client._state.speech_state == SpeechState.LISTENING
+        voice_client._stop_silence_monitor()
+
+    @pytest.mark.asyncio
+    async def test_pause_keeps_one_monitor_task(self, voice_client):
+        voice_client._state.speech_state = SpeechState.LISTENING
+        voice_client._start_silence_timer()
+        task = voice_client._silence_monitor_task
+
+        voice_client._pause_silence_timer()
+        voice_client._resume_silence_timer(time.monotonic())
+        await asyncio.sleep(0)
+
+        assert voice_client._silence_monitor_task is task
+        assert not task.done()
+        voice_client._stop_silence_monitor()
+
+    @pytest.mark.asyncio
+    async def test_hang_stops_monitor(self, voice_client):
+        voice_client._state.speech_state = SpeechState.LISTENING
+        voice_client._state.last_voice_activity = time.monotonic()
+        voice_client._start_silence_timer()
+        await asyncio.sleep(0)
+
+        await voice_client.handle_webhook_event({"message": {"type": "hang"}})
+
+        await asyncio.wait_for(voice_client._silence_monitor_task, timeout=1.0)
+        assert voice_client._state.speech_state == SpeechState.DISCONNECTED
+
+
+class TestSpeechUpdateBatching:
+    @pytest.mark.asyncio
+    async def test_repeated_updates_collapsed(self, voice_client):
+        voice_client._state.tts_active = True
+        voice_client._state.last_tts_start = time.monotonic() - 1.0
+        voice_client._state.speech_state = SpeechState.SPEAKING
+
+        event = {
+            "message": {
+                "type": "speech-update",
+                "status": "started",
+                "role": "user",
+            }
+        }
+        results = await asyncio.gather(
+            *(voice_client.handle_webhook_event(event) for _ in range(3))
+        )
+
+        assert results == [{"action": "stop_speaking"}] * 3
+        assert len(voice_client._state.interruption_history) == 1
+        await voice_client.close()
+
+    @pytest.mark.asyncio
+    async def test_transcript_sees_state_of_preceding_update(self, voice_client):
+        voice_client.set_response_callback(_static_response)
+        voice_client._state.tts_active = True
+        voice_client._state.last_tts_start = time.monotonic() - 1.0
+        voice_client._state.speech_state = SpeechState.SPEAKING
+
+        speech = {"message": {"type": "speech-update", "status": "started", "role": "user"}}
+        transcript = {
+            "message": {
+                "type": "transcript",
+                "transcript": "Wait, what about my test results?",
+                "role": "user",
+                "transcriptType": "final",
+            }
+        }
+        await asyncio.gather(
+            voice_client.handle_webhook_event(speech),
+            voice_client.handle_webhook_event(transcript),
+        )
+
+        # The transcript must be treated as the interruption's follow-up.
+        assert voice_client._state.retry_count == 1
+        assert voice_client._state.interruption_history[-1].user_speech_fragment == (
+            "Wait, what about my test results?"
+        )
+        await voice_client.close()
+
+    @pytest.mark.asyncio
+    async def test_repeat_records_latest_activity(self, voice_client):
+        event = {"message": {"type": "speech-update", "status": "stopped", "role": "user"}}
+        with patch("app.voice.vapi_client.time.monotonic", side_effect=[10.0, 12.0]):
+            await voice_client.handle_webhook_event(event)
+            await voice_client.handle_webhook_event(event)
+
+        assert voice_client._state.last_voice_activity == 12.0
+        await voice_client.close()
+
+
+class TestCreateCall:
+    @pytest.mark.asyncio
+    async def test_payload_shares_static_overrides(self, voice_client):
+        response = MagicMock()
+        response.content = b'{"id": "call-1"}'
+        voice_client._http_client = MagicMock()
+        voice_client._http_client.post = AsyncMock(return_value=response)
+
+        await voice_client.create_call(phone_number="+15550100", customer_name="Pat")
+        await voice_client.create_call()
+
+        first, second = [
+            orjson.loads(c.kwargs["content"])
+            for c in voice_client._http_client.post.await_args_list
+        ]
+        assert first["phoneNumberId"] == "test-phone"
+        assert first["customer"] == {"number": "+15550100", "name": "Pat"}
+        assert "customer" not in second
+        assert first["assistantOverrides"] == voice_client._assistant_overrides
+        assert second["assistantOverrides"] == voice_client._assistant_overrides
+        assert voice_client._state.conversation_id == "call-1"
+
+    @pytest.mark.asyncio
+    async def test_new_call_starts_with_fresh_state(self, voice_client):
+        response = MagicMock()
+        response.content = b'{"id": "call-2"}'
+        voice_client._http_client = MagicMock()
+        voice_client._http_client.post = AsyncMock(return_value=response)
+        voice_client._state.turn_count = 4
+        voice_client._state.interruption_count = 2
+        voice_client._state.speech_state = SpeechState.DISCONNECTED
+
+        await voice_client.create_call()
+
+        assert voice_client._state.turn_count == 0
+        assert voice_client._state.interruption_count == 0
+        assert voice_client._state.speech_state == SpeechState.IDLE
+        assert voice_client._state.conversation_id == "call-2"
+
+
+class TestClose:
+    @pytest.mark.asyncio
+    async def test_close_leaves_shared_pool_open(self, mock_settings):
+        first, second = VapiVoiceClient(), VapiVoiceClient()
+        assert first._http_client is second._http_client
+
+        await first.close()
+        assert not second._http_client.is_closed
+
+        await close_vapi_http_clients()
+        assert second._http_client.is_closed